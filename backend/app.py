@@ -6,16 +6,18 @@ from flask_cors import CORS
 sys.path.insert(0, str(Path(__file__).parent))
 
 import config
-from routes import auth_bp, config_bp, health_bp, audit_bp, users_bp
+from routes import auth_bp, config_bp, health_bp, audit_bp, users_bp, stream_bp
+from services.readiness import start_loading
 
 def create_app():
     app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = config.MAX_UPLOAD_BYTES
 
     CORS(app, resources={
         r"/api/*": {
             "origins": config.CORS_ORIGINS,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "X-Session-Id"],
             "supports_credentials": True
         }
     })
@@ -26,6 +28,11 @@ def create_app():
     app.register_blueprint(config_bp)
     app.register_blueprint(audit_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(stream_bp)
+
+    # Modelos e galeria carregam fora da importação; /api/ready indica quando terminaram
+    if config.PRELOAD_SERVICE:
+        start_loading()
 
     @app.errorhandler(404)
     def not_found(error):
@@ -35,6 +42,10 @@ def create_app():
     def method_not_allowed(error):
         return jsonify({'success': False, 'message': 'Método não permitido'}), 405
 
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return jsonify({'success': False, 'message': 'Imagem excede o tamanho máximo permitido'}), 413
+
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'success': False, 'message': 'Erro interno'}), 500
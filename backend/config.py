@@ -7,31 +7,141 @@ MODELS_DIR = BASE_DIR / 'models'
 
 # Arquivos do sistema
 ENCODINGS_FILE = DATABASE_DIR / 'encodings_encrypted.dat'
+USER_STORE_DIR = DATABASE_DIR / 'users'
+LOGIN_STATE_DB = DATABASE_DIR / 'login_state.db'
+TASK_QUEUE_DB = DATABASE_DIR / 'tasks.db'
+EMBEDDINGS_FILE = DATABASE_DIR / 'embeddings_encrypted.f32'
 ENCRYPTION_KEY_FILE = DATABASE_DIR / 'encryption.key'
 KNOWN_FACES_DIR = DATABASE_DIR / 'known_faces'
 MFA_SECRETS_FILE = DATABASE_DIR / 'mfa_secrets_encrypted.json'
 CONFIG_JSON_FILE = BASE_DIR / 'config.json'
-AUDIT_LOGS_FILE = LOGS_DIR / 'access_logs.json'
+AUDIT_SEGMENTS_DIR = LOGS_DIR / 'audit'  # segmentos JSONL (ativo) e comprimidos (selados) + manifest.json
+AUDIT_LOGS_FILE = LOGS_DIR / 'access_logs.jsonl'  # arquivo único JSONL antigo, migrado para segmentos
+LEGACY_AUDIT_LOGS_FILE = LOGS_DIR / 'access_logs.json'  # array JSON antigo, migrado para segmentos
+AUDIT_CHECKPOINT_FILE = LOGS_DIR / 'audit_checkpoint.dat'
+AUDIT_INDEX_DB = LOGS_DIR / 'audit_index.db'
 
 # Modelos
 FACE_DETECTION_PROTOTXT = MODELS_DIR / 'deploy.prototxt'
 FACE_DETECTION_MODEL = MODELS_DIR / 'res10_300x300_ssd_iter_140000.caffemodel'
 FACENET_MODEL = MODELS_DIR / 'nn4.small2.v1.t7'
+EMBEDDING_DIMENSION = 128
+EMBEDDING_CHUNK_ROWS = 16  # linhas por chunk criptografado; pequeno para o re-ranking descriptografar pouco por linha
+EMBEDDING_CACHE_CHUNKS = 1024  # chunks float32 descriptografados mantidos para o re-ranking (~8 MB)
+
+# Galeria em memória ('none' = float32, 'float16' ou 'int8' com re-ranking exato em float32)
+GALLERY_QUANTIZATION = 'int8'
+GALLERY_RERANK_CANDIDATES = 32
+GALLERY_CALIBRATION_ROWS = 4096
+GALLERY_SCORE_BLOCK_ROWS = 65536
+
+# Índice de busca 1:N ('flat' = exata, 'ivf' = aproximada com re-ranking exato)
+GALLERY_INDEX_TYPE = 'ivf'
+GALLERY_INDEX_FILE = DATABASE_DIR / 'gallery_index_encrypted.dat'
+IVF_NLIST = 256
+IVF_NPROBE = 8  # mais listas visitadas = maior recall, maior latência
+IVF_MIN_TRAIN_SIZE = 4096  # abaixo disso a busca continua exata
+IVF_TRAIN_ITERATIONS = 10
+IVF_RETRAIN_FACTOR = 4
+
+# Armazenamento de usuários (segmentos append-only criptografados por registro)
+USER_STORE_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+USER_STORE_COMPACTION_MIN_BYTES = 1024 * 1024
+USER_STORE_COMPACTION_DEAD_RATIO = 0.5
+USER_STORE_FSYNC = True
 
 # Segurança
 MFA_REQUIRED_LEVELS = [2, 3]
 MAX_LOGIN_ATTEMPTS = 3
 LOCKOUT_DURATION = 300
+STREAM_FAILURE_WINDOW = 3.0  # em /api/auth/stream, intervalo (s) sem processar frames após uma recusa na sessão
 
 # Processamento de imagem
 MIN_FACE_CONFIDENCE = 0.5
 MIN_IMAGE_SIZE = (640, 480)
 TARGET_IMAGE_SIZE = (1280, 720)
+# 'roi' = detecção em cópia reduzida e realce só no recorte da face; 'full' = realce do frame inteiro.
+# Os templates cadastrados foram gerados em 'full': 'roi' muda a entrada do FaceNet e desloca os scores.
+# Só trocar após medir (tools/benchmark_inference.py --images, roi_vs_full_similarity) e recadastrar a galeria
+PREPROCESSING_MODE = 'full'
+DETECTION_MAX_WIDTH = 640
+
+# Filtro de qualidade antes da inferência (medido em uma miniatura em tons de cinza)
+QUALITY_GATE_ENABLED = True
+QUALITY_THUMBNAIL_WIDTH = 160
+QUALITY_MIN_BRIGHTNESS = 10.0
+QUALITY_MAX_BRIGHTNESS = 245.0
+QUALITY_MIN_CONTRAST = 10.0
+QUALITY_MIN_SHARPNESS = 15.0  # variância do Laplaciano na miniatura
+
+# Rastreamento da face entre frames de uma mesma sessão de autenticação contínua
+TRACKING_ENABLED = True
+TRACKING_ROI_PADDING = 0.5  # margem em volta da última face, em fração do lado da caixa
+TRACKING_ROI_INPUT_SIZE = (160, 160)  # entrada do SSD para a ROI (a face ocupa boa parte do recorte)
+TRACKING_FULL_DETECT_INTERVAL = 10  # frames com ROI entre detecções no frame inteiro
+TRACKING_SESSION_TTL = 30  # segundos sem frames até a sessão expirar
+TRACKING_MAX_SESSIONS = 1000
+
+# Cache de embeddings por frame (reenvios idênticos); a decisão é sempre recalculada
+FRAME_CACHE_ENABLED = True
+FRAME_CACHE_MAX_ENTRIES = 1024
+FRAME_CACHE_TTL = 60  # segundos
+# Aceitar frames quase idênticos (dHash) da mesma sessão troca segurança por velocidade: um frame
+# diferente, nunca embedado, pode reaproveitar o embedding de outro e autenticar com ele
+FRAME_CACHE_PERCEPTUAL = False
+FRAME_CACHE_PERCEPTUAL_MAX_DISTANCE = 2  # bits diferentes no dHash de 64 bits
+
+# Inferência: 'thread' (micro-batching + pool de redes no processo da API)
+# ou 'process' (pool de processos com transferência de frames por memória compartilhada)
+INFERENCE_BACKEND = 'thread'
+INFERENCE_WORKERS = None  # None = número de CPUs
+INFERENCE_WORKER_THREADS = 1  # threads do OpenCV em cada worker
+# 'forkserver'/'spawn': o processo da API já tem threads (gravação da auditoria, requisições) e um
+# fork poderia herdar locks presos; 'fork' só é aceito se o pool for criado com uma única thread
+INFERENCE_WORKER_START_METHOD = 'forkserver'
+INFERENCE_WORKER_MAX_FRAME = (1920, 1080)
+
+# Micro-batching de requisições concorrentes (backend 'thread')
+INFERENCE_BATCHING = True
+INFERENCE_BATCH_MAX_SIZE = 8
+INFERENCE_BATCH_WAIT_MS = 8
+
+# Réplicas de cv2.dnn.Net por modelo e threads intra-op do OpenCV (None = padrão do OpenCV)
+DNN_POOL_SIZE = 2
+DNN_POOL_TIMEOUT = 30
+OPENCV_NUM_THREADS = None
+DNN_BACKEND = None  # ex.: 'opencv', 'inference_engine' (None = padrão do OpenCV); ver tools/benchmark_inference.py
+DNN_TARGET = None  # ex.: 'cpu'
+
+# Auditoria
+AUDIT_FSYNC = True  # fsync a cada commit (evento no modo 'sync', lote nos demais)
+AUDIT_DURABILITY = 'group'  # 'sync' (grava na thread da requisição), 'group' (espera o commit do lote) ou 'async' (não espera)
+AUDIT_GROUP_COMMIT_INTERVAL_MS = 2  # espera máxima para juntar entradas em um lote (0 = só o que já estiver na fila)
+AUDIT_GROUP_COMMIT_MAX_BATCH = 256
+AUDIT_SEGMENT_MAX_BYTES = 8 * 1024 * 1024  # segmento ativo é selado ao passar deste tamanho...
+AUDIT_SEGMENT_MAX_AGE = 24 * 3600  # ...ou quando o evento novo for mais recente que o primeiro do segmento por mais que isto (None = sem limite)
+AUDIT_SEGMENT_COMPRESSION = 'gzip'  # 'gzip' ou 'lzma' para os segmentos selados
+AUDIT_PAGE_ENTRIES = 256  # entradas por página (unidade de leitura e de compressão)
+AUDIT_CACHE_PAGES = 32  # páginas mantidas em memória (LRU)
+
+# Fila de tarefas em segundo plano (imagem de referência, auditoria do cadastro)
+TASK_MAX_ATTEMPTS = 8
+TASK_RETRY_BASE_DELAY = 1.0  # segundos; dobra a cada falha
+TASK_RETRY_MAX_DELAY = 300
+
+# QR code do MFA gerado sob demanda em /api/auth/mfa-qr (False = devolvido junto com o cadastro)
+ENROLL_QR_DEFERRED = True
+MFA_QR_TOKEN_TTL = 600  # segundos
+
+# Carregamento dos modelos e da galeria ao iniciar (em segundo plano) e forward sintético de aquecimento
+PRELOAD_SERVICE = True
+MODEL_WARM_UP = True
 
 # Flask
 FLASK_HOST = '127.0.0.1'
 FLASK_PORT = 5000
 FLASK_DEBUG = True
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024  # limite do corpo das requisições de imagem
 
 CORS_ORIGINS = [
     'http://localhost:5500',
@@ -41,5 +151,5 @@ CORS_ORIGINS = [
 ]
 
 # Garantir que diretórios existem
-for directory in [DATABASE_DIR, LOGS_DIR, MODELS_DIR, KNOWN_FACES_DIR]:
+for directory in [DATABASE_DIR, LOGS_DIR, MODELS_DIR, KNOWN_FACES_DIR, USER_STORE_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
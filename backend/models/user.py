@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, List
 import json
@@ -7,12 +7,13 @@ import json
 class User:
     name: str
     permission_level: int
-    face_encodings: List[List[float]]
+    face_encodings: List[List[float]] = field(default_factory=list)
     mfa_secret: Optional[str] = None
     enrolled_date: Optional[str] = None
     last_access: Optional[str] = None
     failed_attempts: int = 0
     lockout_until: Optional[float] = None
+    template_rows: List[int] = field(default_factory=list)
 
     def __post_init__(self):
         if not self.enrolled_date:
@@ -58,7 +59,8 @@ class UserEncoder(json.JSONEncoder):
                 'enrolled_date': obj.enrolled_date,
                 'last_access': obj.last_access,
                 'failed_attempts': obj.failed_attempts,
-                'lockout_until': obj.lockout_until
+                'lockout_until': obj.lockout_until,
+                'template_rows': obj.template_rows
             }
         return super().default(obj)
 
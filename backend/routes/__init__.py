@@ -1,7 +1,23 @@
-from .auth_routes import auth_bp
-from .config_routes import config_bp
-from .health_routes import health_bp
-from .audit_routes import audit_bp
-from .users_routes import users_bp
+"""
+Routes package
 
-__all__ = ['auth_bp', 'config_bp', 'health_bp', 'audit_bp', 'users_bp']
+Blueprints importados sob demanda: health_routes e audit_routes não carregam OpenCV.
+"""
+import importlib
+
+_EXPORTS = {
+    'auth_bp': '.auth_routes',
+    'config_bp': '.config_routes',
+    'health_bp': '.health_routes',
+    'audit_bp': '.audit_routes',
+    'users_bp': '.users_routes',
+    'stream_bp': '.stream_routes'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,27 +1,85 @@
-from flask import Blueprint, request, jsonify
-from services.audit_service import AuditService
+import base64
+import csv
+import io
+import json
+
+from flask import Blueprint, Response, request, jsonify
+from services.audit_index import parse_timestamp
+from services.audit_service import LOG_FIELDS, get_audit_service
 from models.user import UserResponse
 
 audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
-audit_service = AuditService()
+
+
+def _encode_cursor(position):
+    # Opaco para o cliente: só deve ser devolvido como veio
+    return base64.urlsafe_b64encode(json.dumps({'before': position}).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """Posição codificada no cursor; ValueError se inválido"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        position = data['before']
+    except Exception:
+        raise ValueError(cursor)
+
+    if not isinstance(position, int) or position < 0:
+        raise ValueError(cursor)
+    return position
+
+
+def _read_filters():
+    """Filtros comuns a /logs e /export; since/until em ISO 8601 (ValueError se inválidos)"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+
+    return {
+        'user_id': request.args.get('user_id', None, type=str),
+        'event_type': request.args.get('event_type', None, type=str),
+        'decision': request.args.get('decision', None, type=str),
+        'since': parse_timestamp(since) if since else None,
+        'until': parse_timestamp(until) if until else None
+    }
+
+
+def _invalid_parameters(message):
+    return jsonify(UserResponse(success=False, message=message).to_dict()), 400
 
 
 @audit_bp.route('/logs', methods=['GET'])
 def get_logs():
-    """Retorna logs de auditoria com paginação"""
+    """Retorna logs de auditoria com paginação (offset ou cursor) e filtros (user_id, event_type, decision, since, until)"""
     try:
+        audit_service = get_audit_service()
         # Extrair parâmetros
         limit = request.args.get('limit', 50, type=int)
         offset = request.args.get('offset', 0, type=int)
-        user_id = request.args.get('user_id', None, type=str)
+        cursor = request.args.get('cursor', None, type=str)
+
+        # Intervalo de tempo em ISO 8601 (ex.: 2024-01-01T00:00:00Z)
+        try:
+            filters = _read_filters()
+        except ValueError:
+            return _invalid_parameters("Parâmetros since/until devem estar no formato ISO 8601")
+
+        # Com cursor, a página continua de onde a anterior parou e o offset é ignorado
+        before = None
+        if cursor:
+            try:
+                before = _decode_cursor(cursor)
+            except ValueError:
+                return _invalid_parameters("Cursor inválido")
+            offset = 0
 
         # Limitar range
         limit = min(limit, 100)  # Máximo 100 por vez
         offset = max(offset, 0)
 
         # Obter logs
-        logs = audit_service.get_logs(limit=limit, offset=offset, user_id=user_id)
-        total = audit_service.get_total_logs(user_id=user_id)
+        logs, total, next_before = audit_service.query_logs(
+            limit=limit, offset=offset, before=before, **filters
+        )
 
         # Verificar integridade
         is_valid, error_msg = audit_service.verify_integrity()
@@ -34,6 +92,7 @@ def get_logs():
                 "total": total,
                 "limit": limit,
                 "offset": offset,
+                "next_cursor": _encode_cursor(next_before) if next_before is not None else None,
                 "integrity_valid": is_valid,
                 "integrity_error": error_msg if not is_valid else None
             }
@@ -47,10 +106,60 @@ def get_logs():
         ).to_dict()), 500
 
 
+@audit_bp.route('/export', methods=['GET'])
+def export_logs():
+    """Exporta logs em streaming (NDJSON ou CSV) na ordem da cadeia, com prev_hash/hash de cada entrada"""
+    export_format = request.args.get('format', 'ndjson', type=str)
+    start = request.args.get('start', 0, type=int)
+
+    if export_format not in ('ndjson', 'csv'):
+        return _invalid_parameters("Formato deve ser ndjson ou csv")
+
+    try:
+        filters = _read_filters()
+    except ValueError:
+        return _invalid_parameters("Parâmetros since/until devem estar no formato ISO 8601")
+
+    try:
+        audit_service = get_audit_service()
+        entries = audit_service.export_logs(start=max(start, 0), **filters)
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
+
+    if export_format == 'ndjson':
+        # Linha a linha exatamente como gravado: o consumidor recalcula os hashes conforme recebe
+        body = (json.dumps(log, ensure_ascii=False) + '\n' for log in entries)
+        mimetype = 'application/x-ndjson'
+    else:
+        def generate_csv():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=LOG_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for log in entries:
+                writer.writerow(log)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+            yield buffer.getvalue()
+
+        body = generate_csv()
+        mimetype = 'text/csv'
+
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=audit_logs.{export_format}'
+    })
+
+
 @audit_bp.route('/verify-integrity', methods=['GET'])
 def verify_integrity():
-    """Verifica integridade da cadeia de logs"""
+    """Verifica integridade da cadeia de logs a partir do último checkpoint"""
     try:
+        audit_service = get_audit_service()
         is_valid, error_msg = audit_service.verify_integrity()
         total = audit_service.get_total_logs()
 
@@ -70,3 +179,99 @@ def verify_integrity():
             message="Erro interno do servidor",
             error=str(e)
         ).to_dict()), 500
+
+
+@audit_bp.route('/segments', methods=['GET'])
+def get_segments():
+    """Segmentos selados (manifesto com raízes Merkle) e estado do segmento ativo"""
+    try:
+        audit_service = get_audit_service()
+        return jsonify(UserResponse(
+            success=True,
+            message="Segmentos da auditoria",
+            data={
+                "segments": [
+                    {k: v for k, v in segment.items() if k != 'page_offsets'}
+                    for segment in audit_service.store.segments
+                ],
+                **audit_service.store.get_stats()
+            }
+        ).to_dict()), 200
+
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
+
+
+@audit_bp.route('/segments/<int:segment_id>/verify', methods=['GET'])
+def verify_segment(segment_id):
+    """Verifica só um segmento selado (cadeia interna, raiz Merkle e encadeamento com o anterior)"""
+    try:
+        audit_service = get_audit_service()
+        if segment_id < 0 or segment_id >= len(audit_service.store.segments):
+            return jsonify(UserResponse(
+                success=False,
+                message="Segmento não encontrado"
+            ).to_dict()), 404
+
+        is_valid, error_msg = audit_service.verify_segment(segment_id)
+
+        return jsonify(UserResponse(
+            success=True,
+            message="Verificação concluída",
+            data={
+                "segment": segment_id,
+                "integrity_valid": is_valid,
+                "error": error_msg
+            }
+        ).to_dict()), 200
+
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
+
+
+@audit_bp.route('/verify-integrity/full', methods=['POST'])
+def start_full_verification():
+    """Inicia em segundo plano a verificação completa da cadeia desde a gênese"""
+    try:
+        audit_service = get_audit_service()
+        started = audit_service.start_full_verification()
+
+        return jsonify(UserResponse(
+            success=True,
+            message="Verificação completa iniciada" if started else "Verificação completa já em andamento",
+            data=audit_service.full_verification
+        ).to_dict()), 202
+
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
+
+
+@audit_bp.route('/verify-integrity/full', methods=['GET'])
+def get_full_verification():
+    """Estado da última verificação completa"""
+    try:
+        audit_service = get_audit_service()
+        return jsonify(UserResponse(
+            success=True,
+            message="Estado da verificação completa",
+            data=audit_service.full_verification
+        ).to_dict()), 200
+
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
@@ -1,27 +1,62 @@
 from flask import Blueprint, request, jsonify
 from utils.validators import validate_username, validate_security_level, validate_otp_code
-from utils.image_utils import decode_base64_image, validate_image
-from services.facial_recognition_service import FacialRecognitionService
+import config
+from utils.image_utils import decode_base64_image, decode_image_bytes, validate_image
+from services.readiness import get_facial_service
 from models.user import UserResponse
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
-facial_service = FacialRecognitionService()
+
+BINARY_IMAGE_TYPES = ('image/jpeg', 'image/png', 'application/octet-stream')
+
+
+def _read_frame_request():
+    """Extrai (campos, imagem) de uma requisição JSON (base64), multipart/form-data ou corpo binário.
+
+    No multipart a imagem vem no arquivo 'image' e os demais campos no formulário;
+    no corpo binário os campos vêm na query string. Retorna (None, None) para formatos não suportados."""
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        return request.form, upload.read() if upload else None
+
+    if request.mimetype in BINARY_IMAGE_TYPES:
+        return request.args, request.stream.read() or None
+
+    data = request.get_json(silent=True)
+    if not data:
+        return None, None
+    return data, data.get('image')
+
+
+def _read_session_id(fields):
+    # Identificador da sessão de câmera do cliente (rastreamento da face entre frames)
+    session_id = request.headers.get('X-Session-Id') or fields.get('session_id')
+    if not session_id or len(session_id) > 64:
+        return None
+    return session_id
+
+
+def _decode_frame(image_data):
+    # Bytes chegam direto do upload; strings são data URLs/base64 do formato JSON
+    if isinstance(image_data, (bytes, bytearray)):
+        return decode_image_bytes(image_data, config.MIN_IMAGE_SIZE)
+    return decode_base64_image(image_data, config.MIN_IMAGE_SIZE)
 
 
 @auth_bp.route('/enroll', methods=['POST'])
 def enroll_user():
     """Cadastra um novo usuário no sistema através de reconhecimento facial"""
     try:
-        if not request.json:
+        fields, image_data = _read_frame_request()
+        if fields is None:
             return jsonify(UserResponse(
                 success=False,
                 message="Requisição inválida",
-                error="Corpo da requisição deve ser JSON"
+                error="Corpo da requisição deve ser JSON, multipart/form-data ou imagem binária"
             ).to_dict()), 400
 
-        name = request.json.get('name', '').strip()
-        security_level = request.json.get('security_level')
-        image_base64 = request.json.get('image')
+        name = (fields.get('name') or '').strip()
+        security_level = fields.get('security_level')
 
         is_valid, message = validate_username(name)
         if not is_valid:
@@ -39,14 +74,14 @@ def enroll_user():
                 error=message
             ).to_dict()), 400
 
-        if not image_base64:
+        if not image_data:
             return jsonify(UserResponse(
                 success=False,
                 message="Imagem não fornecida",
                 error="Campo 'image' é obrigatório"
             ).to_dict()), 400
 
-        image = decode_base64_image(image_base64)
+        image = _decode_frame(image_data)
         if image is None:
             return jsonify(UserResponse(
                 success=False,
@@ -62,7 +97,7 @@ def enroll_user():
                 error=message
             ).to_dict()), 400
 
-        success, msg, qr_code = facial_service.enroll_user(name, level, image)
+        success, msg, mfa_setup = get_facial_service().enroll_user(name, level, image)
 
         if not success:
             return jsonify(UserResponse(
@@ -72,8 +107,8 @@ def enroll_user():
             ).to_dict()), 400
 
         response_data = {"requires_mfa": level >= 2}
-        if qr_code:
-            response_data["qr_code"] = qr_code
+        if mfa_setup:
+            response_data.update(mfa_setup)
 
         return jsonify(UserResponse(
             success=True,
@@ -93,18 +128,16 @@ def enroll_user():
 def authenticate_user():
     """Realiza autenticação do usuário através de reconhecimento facial"""
     try:
-        # Validar JSON
-        if not request.json:
+        # Ler campos e imagem
+        fields, image_data = _read_frame_request()
+        if fields is None:
             return jsonify(UserResponse(
                 success=False,
                 message="Requisição inválida",
-                error="Corpo da requisição deve ser JSON"
+                error="Corpo da requisição deve ser JSON, multipart/form-data ou imagem binária"
             ).to_dict()), 400
 
-        # Extrair imagem
-        image_base64 = request.json.get('image')
-
-        if not image_base64:
+        if not image_data:
             return jsonify(UserResponse(
                 success=False,
                 message="Imagem não fornecida",
@@ -112,7 +145,7 @@ def authenticate_user():
             ).to_dict()), 400
 
         # Decodificar imagem
-        image = decode_base64_image(image_base64)
+        image = _decode_frame(image_data)
         if image is None:
             return jsonify(UserResponse(
                 success=False,
@@ -121,7 +154,9 @@ def authenticate_user():
             ).to_dict()), 400
 
         # Autenticar
-        success, username, level, confidence, requires_mfa, msg = facial_service.authenticate_user(image)
+        success, username, level, confidence, requires_mfa, msg = get_facial_service().authenticate_user(
+            image, session_id=_read_session_id(fields)
+        )
 
         if not success:
             return jsonify(UserResponse(
@@ -152,6 +187,42 @@ def authenticate_user():
         ).to_dict()), 500
 
 
+@auth_bp.route('/mfa-qr', methods=['POST'])
+def get_mfa_qr_code():
+    """Gera o QR code do MFA a partir do token devolvido pelo cadastro (válido até expirar ou até o primeiro MFA verificado)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        qr_token = data.get('qr_token')
+
+        if not qr_token:
+            return jsonify(UserResponse(
+                success=False,
+                message="Token não fornecido",
+                error="Campo 'qr_token' é obrigatório"
+            ).to_dict()), 400
+
+        qr_code = get_facial_service().get_mfa_qr_code(qr_token)
+        if not qr_code:
+            return jsonify(UserResponse(
+                success=False,
+                message="Token inválido ou expirado",
+                error="Não foi possível gerar o QR code"
+            ).to_dict()), 404
+
+        return jsonify(UserResponse(
+            success=True,
+            message="QR code gerado",
+            data={"qr_code": qr_code}
+        ).to_dict()), 200
+
+    except Exception as e:
+        return jsonify(UserResponse(
+            success=False,
+            message="Erro interno do servidor",
+            error=str(e)
+        ).to_dict()), 500
+
+
 @auth_bp.route('/verify-mfa', methods=['POST'])
 def verify_mfa():
     """Valida código de autenticação de dois fatores e libera acesso ao sistema"""
@@ -187,7 +258,7 @@ def verify_mfa():
             ).to_dict()), 400
 
         # Verificar MFA
-        success, msg = facial_service.verify_mfa_and_grant_access(username, otp_code)
+        success, msg = get_facial_service().verify_mfa_and_grant_access(username, otp_code)
 
         if not success:
             return jsonify(UserResponse(
@@ -1,17 +1,16 @@
 from flask import Blueprint, request, jsonify
 from utils.validators import validate_threshold
-from services.facial_recognition_service import FacialRecognitionService
+from services.readiness import get_facial_service
 from models.user import UserResponse
 
 config_bp = Blueprint('config', __name__, url_prefix='/api/config')
-facial_service = FacialRecognitionService()
 
 
 @config_bp.route('', methods=['GET'])
 def get_config():
     """Retorna configurações atuais dos thresholds"""
     try:
-        thresholds = facial_service.thresholds
+        thresholds = get_facial_service().thresholds
 
         return jsonify(UserResponse(
             success=True,
@@ -83,7 +82,7 @@ def update_config():
             ).to_dict()), 400
 
         # Atualizar thresholds
-        success, msg = facial_service.update_thresholds(value_1, value_2, value_3)
+        success, msg = get_facial_service().update_thresholds(value_1, value_2, value_3)
 
         if not success:
             return jsonify(UserResponse(
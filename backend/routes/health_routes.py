@@ -1,19 +1,41 @@
 from flask import Blueprint, jsonify
-from services.audit_service import AuditService
+from services.audit_service import get_audit_service
+from services.readiness import readiness
+from utils.metrics import metrics
 
 health_bp = Blueprint('health', __name__, url_prefix='/api')
-audit_service = AuditService()
 
 
 @health_bp.route('/', methods=['GET'])
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check do sistema"""
+    audit_service = get_audit_service()
     is_valid, error_msg = audit_service.verify_integrity()
 
+    # Tarefas em segundo plano (imagem de referência, auditoria do cadastro) que falharam
+    tasks = metrics.stats('task_queue')
+
     return jsonify({
-        "status": "ok",
+        "status": "degraded" if tasks and tasks['failed'] else "ok",
         "message": "Sistema de reconhecimento facial operacional",
         "integrity_check": "passed" if is_valid else "failed",
-        "integrity_error": error_msg if not is_valid else None
+        "integrity_error": error_msg if not is_valid else None,
+        "background_tasks": tasks
+    }), 200
+
+
+@health_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """Prontidão: modelos carregados, galeria carregada e forward de aquecimento concluído"""
+    state = readiness.snapshot()
+    return jsonify(state), 200 if state['status'] == 'ready' else 503
+
+
+@health_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Tempos por etapa do pipeline e contadores do sistema"""
+    return jsonify({
+        "status": "ok",
+        **metrics.snapshot()
     }), 200
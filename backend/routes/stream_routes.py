@@ -0,0 +1,42 @@
+import json
+
+from flask import Blueprint
+from services.auth_stream import AuthStreamSession
+from services.readiness import get_facial_service
+
+try:
+    from flask_sock import Sock
+except ImportError:  # flask-sock não instalado: a API segue disponível só com o polling HTTP
+    Sock = None
+
+stream_bp = Blueprint('stream', __name__, url_prefix='/api/auth')
+
+
+def handle_stream(ws):
+    """Autenticação contínua: frames binários do cliente, eventos JSON do servidor"""
+    session = AuthStreamSession(get_facial_service(), send=lambda event: ws.send(json.dumps(event)))
+
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+
+            if isinstance(message, (bytes, bytearray)):
+                session.push(message)
+                continue
+
+            # Mensagens de texto são comandos de controle, ex.: {"type": "resume"} após cancelar o MFA
+            try:
+                command = json.loads(message)
+            except ValueError:
+                continue
+            if isinstance(command, dict) and command.get('type') == 'resume':
+                session.resume()
+    finally:
+        session.close()
+
+
+if Sock is not None:
+    sock = Sock()
+    sock.route('/stream', bp=stream_bp)(handle_stream)
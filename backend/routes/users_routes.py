@@ -1,15 +1,14 @@
 from flask import Blueprint, request, jsonify
-from services.facial_recognition_service import FacialRecognitionService
+from services.readiness import get_facial_service
 from models.user import UserResponse
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
-facial_service = FacialRecognitionService()
 
 
 @users_bp.route('', methods=['GET'])
 def get_all_users():
     try:
-        users = facial_service.get_all_users()
+        users = get_facial_service().get_all_users()
 
         return jsonify(UserResponse(
             success=True,
@@ -32,27 +31,21 @@ def get_all_users():
 def delete_user(username):
     try:
         # Verificar se usuário existe
-        if username not in facial_service.users:
+        if username not in get_facial_service().users:
             return jsonify(UserResponse(
                 success=False,
                 message="Usuário não encontrado",
                 error=f"Usuário '{username}' não existe"
             ).to_dict()), 404
 
-        # Remover usuário
-        del facial_service.users[username]
-        facial_service._save_users()
-
-        # Remover MFA secret se existir
-        facial_service.mfa_service.remove_secret(username)
-
-        # Registrar no audit log
-        facial_service.audit_service.add_log(
-            event_type="user_deletion",
-            user_id=username,
-            decision="granted",
-            reason=f"Usuário {username} foi deletado do sistema"
-        )
+        # Remover usuário (galeria, MFA secret, imagem de referência e audit log)
+        success, msg = get_facial_service().delete_user(username)
+        if not success:
+            return jsonify(UserResponse(
+                success=False,
+                message="Usuário não encontrado",
+                error=msg
+            ).to_dict()), 404
 
         return jsonify(UserResponse(
             success=True,
@@ -71,14 +64,14 @@ def delete_user(username):
 def get_user(username):
     try:
         # Verificar se usuário existe
-        if username not in facial_service.users:
+        if username not in get_facial_service().users:
             return jsonify(UserResponse(
                 success=False,
                 message="Usuário não encontrado",
                 error=f"Usuário '{username}' não existe"
             ).to_dict()), 404
 
-        user = facial_service.users[username]
+        user = get_facial_service().users[username]
 
         return jsonify(UserResponse(
             success=True,
@@ -1,14 +1,21 @@
 """
 Services package
+
+Os serviços são importados sob demanda: rotas leves (health, audit) não carregam OpenCV.
 """
-from .encryption_service import EncryptionService
-from .audit_service import AuditService
-from .mfa_service import MFAService
-from .facial_recognition_service import FacialRecognitionService
-
-__all__ = [
-    'EncryptionService',
-    'AuditService',
-    'MFAService',
-    'FacialRecognitionService'
-]
+import importlib
+
+_EXPORTS = {
+    'EncryptionService': '.encryption_service',
+    'AuditService': '.audit_service',
+    'MFAService': '.mfa_service',
+    'FacialRecognitionService': '.facial_recognition_service'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import config
+
+def parse_timestamp(value):
+    """ISO 8601 (com 'Z', offset ou sem fuso = UTC) -> segundos desde a época"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class AuditIndex:
+    """Índices secundários da auditoria (usuário, tipo de evento, decisão e timestamp) em SQLite.
+
+    O JSONL continua sendo a fonte da verdade: o índice guarda só a posição de cada entrada na
+    cadeia e é reconstruído a partir do log quando fica para trás ou muda de esquema."""
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path=config.AUDIT_INDEX_DB):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+            self.conn.execute('DROP TABLE IF EXISTS audit_index')
+
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS audit_index ('
+            ' position INTEGER PRIMARY KEY,'
+            ' ts REAL NOT NULL,'
+            ' user_id TEXT,'
+            ' event_type TEXT,'
+            ' decision TEXT)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_user ON audit_index (user_id, position)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_event ON audit_index (event_type, position)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_decision ON audit_index (decision, position)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_index (ts)')
+        self.conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self.conn.commit()
+
+    def _row(self, position, log):
+        try:
+            ts = parse_timestamp(log['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            ts = 0.0
+        return position, ts, log.get('user_id'), log.get('event_type'), log.get('decision')
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM audit_index').fetchone()[0]
+
+    def sync(self, count, read_from):
+        """Alinha o índice com as count entradas do log; read_from(posição) percorre (posição, entrada) dali em diante"""
+        with self._lock:
+            self.conn.execute('DELETE FROM audit_index WHERE position >= ?', (count,))
+            indexed = self.conn.execute('SELECT COUNT(*) FROM audit_index').fetchone()[0]
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO audit_index VALUES (?, ?, ?, ?, ?)',
+                (self._row(position, log) for position, log in read_from(indexed))
+            )
+            self.conn.commit()
+
+    def add(self, position, log):
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO audit_index VALUES (?, ?, ?, ?, ?)', self._row(position, log))
+            self.conn.commit()
+
+    def add_many(self, start, logs):
+        """Indexa entradas consecutivas a partir da posição start (um commit por lote)"""
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO audit_index VALUES (?, ?, ?, ?, ?)',
+                (self._row(start + offset, log) for offset, log in enumerate(logs))
+            )
+            self.conn.commit()
+
+    def _where(self, user_id, event_type, decision, since, until, extra=()):
+        clauses, params = [], []
+        for clause, value in extra:
+            clauses.append(clause)
+            params.append(value)
+        for column, value in (('user_id', user_id), ('event_type', event_type), ('decision', decision)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('ts <= ?')
+            params.append(until)
+
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, user_id=None, event_type=None, decision=None, since=None, until=None, limit=50, offset=0,
+              before=None):
+        """Retorna (posições da página, mais recentes primeiro, total de entradas que atendem aos filtros).
+
+        Com before (cursor), a página começa logo abaixo dessa posição em vez de pular offset linhas."""
+        where, params = self._where(user_id, event_type, decision, since, until)
+        page_where, page_params = self._where(
+            user_id, event_type, decision, since, until,
+            extra=[('position < ?', before)] if before is not None else ()
+        )
+
+        with self._lock:
+            positions = [row[0] for row in self.conn.execute(
+                f'SELECT position FROM audit_index{page_where} ORDER BY position DESC LIMIT ? OFFSET ?',
+                page_params + [limit, offset]
+            )]
+            total = self.conn.execute(f'SELECT COUNT(*) FROM audit_index{where}', params).fetchone()[0]
+
+        return positions, total
+
+    def iter_positions(self, user_id=None, event_type=None, decision=None, since=None, until=None, start=0,
+                       chunk_size=500):
+        """Posições em ordem da cadeia, lidas em blocos (memória constante para exportações)"""
+        position = start - 1
+        while True:
+            where, params = self._where(user_id, event_type, decision, since, until,
+                                        extra=[('position > ?', position)])
+            with self._lock:
+                chunk = [row[0] for row in self.conn.execute(
+                    f'SELECT position FROM audit_index{where} ORDER BY position LIMIT ?',
+                    params + [chunk_size]
+                )]
+
+            yield from chunk
+            if len(chunk) < chunk_size:
+                return
+            position = chunk[-1]
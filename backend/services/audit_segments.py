@@ -0,0 +1,398 @@
+import bisect
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+import config
+from .audit_index import parse_timestamp
+
+GENESIS_HASH = "0" * 64
+
+# Sufixo, abertura em streaming e compressão/descompressão de um bloco (membro gzip ou stream xz)
+_COMPRESSORS = {
+    'gzip': ('.jsonl.gz', gzip.open, gzip.compress, gzip.decompress),
+    'lzma': ('.jsonl.xz', lzma.open, lzma.compress, lzma.decompress)
+}
+
+def _compression_of(segment):
+    return 'lzma' if segment['file'].endswith(_COMPRESSORS['lzma'][0]) else 'gzip'
+
+def _open_sealed(directory, segment):
+    return _COMPRESSORS[_compression_of(segment)][1](directory / segment['file'], 'rt', encoding='utf-8')
+
+def merkle_root(hashes):
+    """Raiz Merkle (sha256) dos hashes das entradas; nível ímpar duplica o último nó"""
+    level = [bytes.fromhex(h) for h in hashes]
+    if not level:
+        return GENESIS_HASH
+
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+
+    return level[0].hex()
+
+def chain_root(prev_root, root):
+    """Encadeia a raiz Merkle do segmento à do segmento anterior"""
+    return hashlib.sha256((prev_root + root).encode()).hexdigest()
+
+class AuditSegmentStore:
+    """Trilha de auditoria em segmentos JSONL limitados por tamanho ou idade.
+
+    Só o segmento ativo recebe appends. Ao fechar, o segmento é selado: raiz Merkle dos hashes
+    das entradas, encadeada à raiz do segmento anterior, gravada no manifesto, e o arquivo é
+    comprimido (gzip/lzma). A cadeia prev_hash -> hash das entradas continua entre segmentos.
+
+    Em memória ficam só o manifesto, a cabeça da cadeia e um LRU de páginas (blocos de
+    page_entries entradas). Cada página de um segmento selado é um membro comprimido
+    independente, então ler uma entrada antiga descomprime só a página dela."""
+
+    MANIFEST_VERSION = 1
+
+    def __init__(self, directory=config.AUDIT_SEGMENTS_DIR,
+                 max_bytes=config.AUDIT_SEGMENT_MAX_BYTES,
+                 max_age=config.AUDIT_SEGMENT_MAX_AGE,
+                 compression=config.AUDIT_SEGMENT_COMPRESSION,
+                 fsync=config.AUDIT_FSYNC,
+                 page_entries=config.AUDIT_PAGE_ENTRIES,
+                 cache_pages=config.AUDIT_CACHE_PAGES):
+        if compression not in _COMPRESSORS:
+            raise ValueError(f"Compressão de segmento desconhecida: {compression}")
+
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_file = self.directory / 'manifest.json'
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+        self.fsync = fsync
+        self.page_entries = page_entries
+        self.cache_pages = cache_pages
+        self._lock = threading.RLock()
+
+        self._pages = OrderedDict()
+        self.page_hits = 0
+        self.page_misses = 0
+
+        self.segments = self._load_manifest()
+        self._first_positions = [segment['first_position'] for segment in self.segments]
+        self._open_active()
+
+    # Manifesto e segmento ativo
+
+    def _load_manifest(self):
+        if not self.manifest_file.exists():
+            return []
+
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['segments']
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_file.with_name(self.manifest_file.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.MANIFEST_VERSION, 'segments': self.segments}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_file)
+
+    def _segment_path(self, segment_id, suffix='.jsonl'):
+        return self.directory / f'segment_{segment_id:06d}{suffix}'
+
+    def _open_active(self):
+        self.active_id = len(self.segments)
+        self.active_first_position = self.segments[-1]['last_position'] + 1 if self.segments else 0
+        self.active_path = self._segment_path(self.active_id)
+
+        # Queda depois de gravar o manifesto e antes de apagar o JSONL do segmento selado
+        if self.segments:
+            leftover = self._segment_path(self.segments[-1]['id'])
+            if leftover.exists():
+                leftover.unlink()
+
+        self.active_count = 0
+        self.active_bytes = 0
+        self._active_page_offsets = []
+        self._active_started_at = None
+        self.corruption = None
+        self._head_hash = self.segments[-1]['last_hash'] if self.segments else GENESIS_HASH
+        self._scan_active()
+
+        self._file = open(self.active_path, 'ab')
+
+    def _scan_active(self):
+        # Percorre o segmento ativo sem guardar as entradas: só offsets das páginas e a cabeça
+        if not self.active_path.exists():
+            return
+
+        with open(self.active_path, 'rb') as f:
+            for line in f:
+                # Só a última linha pode estar sem '\n' (queda durante a escrita)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                    self._track(entry, len(line))
+                except (ValueError, KeyError, TypeError):
+                    # Linha completa inválida no meio da trilha: adulteração, nada é descartado
+                    self.corruption = f"Entrada corrompida no log #{self.count}"
+                    return
+
+        # Linha incompleta no final: descartar
+        if self.active_bytes < self.active_path.stat().st_size:
+            with open(self.active_path, 'r+b') as f:
+                f.truncate(self.active_bytes)
+
+    def _track(self, entry, size):
+        if self.active_count % self.page_entries == 0:
+            self._active_page_offsets.append(self.active_bytes)
+        if self.active_count == 0:
+            self._active_started_at = self._entry_time(entry)
+
+        self.active_count += 1
+        self.active_bytes += size
+        self._head_hash = entry['hash']
+
+    @property
+    def count(self):
+        return self.active_first_position + self.active_count
+
+    @property
+    def head_hash(self):
+        return self._head_hash
+
+    # Escrita
+
+    def append(self, entry, sync=True):
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            # Encadear depois de uma entrada corrompida esconderia a adulteração
+            if self.corruption:
+                raise RuntimeError(f"Trilha de auditoria corrompida: {self.corruption}")
+
+            # Segmentos cobrem no máximo max_age segundos de eventos (pelo timestamp das entradas)
+            if (self.active_count and self.max_age is not None
+                    and self._entry_time(entry) - self._active_started_at >= self.max_age):
+                self.seal()
+
+            self._file.write(line)
+            if sync:
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+
+            self._track(entry, len(line))
+
+            if self.active_bytes >= self.max_bytes:
+                self.seal()
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _entry_time(self, entry):
+        try:
+            return parse_timestamp(entry['timestamp'])
+        except (KeyError, TypeError, ValueError):
+            return time.time()
+
+    def seal(self):
+        """Fecha o segmento ativo: comprime página a página, registra a raiz Merkle no manifesto e abre o próximo"""
+        with self._lock:
+            if not self.active_count:
+                return None
+
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+            suffix, _, compress, _ = _COMPRESSORS[self.compression]
+            sealed_path = self._segment_path(self.active_id, suffix)
+            tmp_path = sealed_path.with_name(sealed_path.name + '.tmp')
+
+            hashes = []
+            page_offsets = []
+            first = last = None
+            with open(self.active_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                while True:
+                    lines = list(islice(src, self.page_entries))
+                    if not lines:
+                        break
+
+                    page_offsets.append(dst.tell())
+                    dst.write(compress(b''.join(lines)))
+
+                    for line in lines:
+                        last = json.loads(line)
+                        first = first or last
+                        hashes.append(last['hash'])
+
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, sealed_path)
+
+            root = merkle_root(hashes)
+            prev_root = self.segments[-1]['chain_root'] if self.segments else GENESIS_HASH
+            segment = {
+                'id': self.active_id,
+                'file': sealed_path.name,
+                'first_position': self.active_first_position,
+                'last_position': self.active_first_position + len(hashes) - 1,
+                'first_prev_hash': first['prev_hash'],
+                'last_hash': last['hash'],
+                'first_timestamp': first.get('timestamp'),
+                'last_timestamp': last.get('timestamp'),
+                'merkle_root': root,
+                'chain_root': chain_root(prev_root, root),
+                'compressed_bytes': sealed_path.stat().st_size,
+                'page_entries': self.page_entries,
+                'page_offsets': page_offsets,
+                'sealed_at': time.time()
+            }
+
+            self.segments.append(segment)
+            self._first_positions.append(segment['first_position'])
+            self._save_manifest()
+
+            self.active_path.unlink()
+            self._open_active()
+            return segment
+
+    # Leitura
+
+    def _locate(self, position):
+        """(id do segmento, primeira posição do segmento, entradas por página) da posição"""
+        with self._lock:
+            if position >= self.active_first_position:
+                return self.active_id, self.active_first_position, self.page_entries
+
+            segment = self.segments[bisect.bisect_right(self._first_positions, position) - 1]
+            return segment['id'], segment['first_position'], segment.get('page_entries', self.page_entries)
+
+    def _read_active_page(self, page):
+        # Chamado com o lock: o arquivo ativo não é selado no meio da leitura
+        self._file.flush()
+        remaining = min(self.page_entries, self.active_count - page * self.page_entries)
+
+        with open(self.active_path, 'rb') as f:
+            f.seek(self._active_page_offsets[page])
+            return [json.loads(f.readline()) for _ in range(remaining)]
+
+    def _read_sealed_page(self, segment, page):
+        page_entries = segment.get('page_entries', self.page_entries)
+
+        if 'page_offsets' not in segment:
+            # Selado como um único bloco: descomprime em streaming até a página
+            with _open_sealed(self.directory, segment) as f:
+                return [json.loads(line) for line in islice(f, page * page_entries, (page + 1) * page_entries)]
+
+        offsets = segment['page_offsets']
+        with open(self.directory / segment['file'], 'rb') as f:
+            f.seek(offsets[page])
+            data = f.read(offsets[page + 1] - offsets[page]) if page + 1 < len(offsets) else f.read()
+
+        decompress = _COMPRESSORS[_compression_of(segment)][3]
+        return [json.loads(line) for line in decompress(data).splitlines()]
+
+    def _page(self, segment_id, page):
+        key = (segment_id, page)
+        with self._lock:
+            entries = self._pages.get(key)
+            if entries is not None:
+                self._pages.move_to_end(key)
+                self.page_hits += 1
+                return entries
+
+            self.page_misses += 1
+            if segment_id >= len(self.segments):
+                entries = self._read_active_page(page)
+                # A última página do segmento ativo ainda cresce: só páginas completas vão para o cache
+                if len(entries) < self.page_entries:
+                    return entries
+            else:
+                segment = self.segments[segment_id]
+
+        if entries is None:
+            entries = self._read_sealed_page(segment, page)
+
+        with self._lock:
+            self._pages[key] = entries
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.cache_pages:
+                self._pages.popitem(last=False)
+
+        return entries
+
+    def get_many(self, positions):
+        """Entradas nas posições pedidas (mesma ordem), lendo só as páginas envolvidas"""
+        result = []
+        for position in positions:
+            segment_id, first_position, page_entries = self._locate(position)
+            page, offset = divmod(position - first_position, page_entries)
+            result.append(self._page(segment_id, page)[offset])
+        return result
+
+    def get(self, position):
+        return self.get_many([position])[0]
+
+    def iter_segments(self, start=0):
+        """Percorre (segmento selado ou None para o ativo, iterador de (posição, entrada)) a partir de start"""
+        with self._lock:
+            segments = list(self.segments)
+            active_id, active_first, end = self.active_id, self.active_first_position, self.count
+
+        first_sealed = bisect.bisect_right(self._first_positions, start) - 1 if start < active_first else len(segments)
+        for segment in segments[max(first_sealed, 0):]:
+            yield segment, self._iter_sealed(segment, start)
+
+        yield None, self._iter_active(active_id, active_first, end, start)
+
+    def _iter_sealed(self, segment, start):
+        # Streaming: descomprime linha a linha sem carregar o segmento inteiro
+        with _open_sealed(self.directory, segment) as f:
+            for position, line in enumerate(f, start=segment['first_position']):
+                if position >= start:
+                    yield position, json.loads(line)
+
+    def _iter_active(self, active_id, active_first, end, start):
+        # Página a página; se o segmento for selado no meio, _page passa a ler o arquivo comprimido
+        position = max(start, active_first)
+        while position < end:
+            page, offset = divmod(position - active_first, self.page_entries)
+            for entry in self._page(active_id, page)[offset:]:
+                if position >= end:
+                    return
+                yield position, entry
+                position += 1
+
+    def iter_segment(self, segment_id):
+        return self._iter_sealed(self.segments[segment_id], 0)
+
+    def iter_entries(self, start=0):
+        for _, entries in self.iter_segments(start):
+            yield from entries
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.page_hits + self.page_misses
+            return {
+                'sealed_segments': len(self.segments),
+                'sealed_compressed_bytes': sum(segment['compressed_bytes'] for segment in self.segments),
+                'active_segment': self.active_id,
+                'active_entries': self.active_count,
+                'active_bytes': self.active_bytes,
+                'compression': self.compression,
+                'cached_pages': len(self._pages),
+                'max_cached_pages': self.cache_pages,
+                'page_hits': self.page_hits,
+                'page_misses': self.page_misses,
+                'page_hit_rate': self.page_hits / lookups if lookups else 0.0
+            }
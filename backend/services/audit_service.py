@@ -1,49 +1,116 @@
 import json
 import hashlib
+import os
+import threading
+import time
 from datetime import datetime
 import config
+from utils.metrics import metrics
+from .audit_index import AuditIndex
+from .audit_segments import GENESIS_HASH, AuditSegmentStore, chain_root, merkle_root
+from .audit_writer import AuditWriter
+from .encryption_service import EncryptionService
+
+DURABILITY_MODES = ('sync', 'group', 'async')
+
+# Ordem das colunas na exportação CSV
+LOG_FIELDS = [
+    "timestamp", "event_type", "user_id", "decision", "confidence_score",
+    "reason", "mfa_used", "ip_address", "prev_hash", "hash"
+]
+
+def calculate_hash(log_entry, prev_hash):
+    """sha256 da entrada (sem prev_hash/hash, chaves ordenadas) concatenada ao hash anterior"""
+    data = json.dumps({k: v for k, v in log_entry.items() if k not in ("prev_hash", "hash")},
+                      sort_keys=True) + prev_hash
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def get_audit_service():
+    """AuditService criado na primeira chamada (não na importação das rotas); chamadas concorrentes aguardam"""
+    return AuditService()
 
 class AuditService:
     _instance = None
+    # Criação e inicialização do singleton serializadas: duas threads não podem abrir o store nem migrar juntas
+    _instance_lock = threading.RLock()
 
     def __new__(cls):
-        if not cls._instance:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+        with cls._instance_lock:
+            if not cls._instance:
+                cls._instance = super().__new__(cls)
+                cls._instance._initialized = False
+            return cls._instance
 
     def __init__(self):
-        if self._initialized:
-            return
+        with self._instance_lock:
+            if not self._initialized:
+                self._setup()
 
+    def _setup(self):
         self.log_file = config.AUDIT_LOGS_FILE
-        self.log_file.parent.mkdir(parents=True, exist_ok=True)
-        self.logs = self._load_logs()
+        self.legacy_log_file = config.LEGACY_AUDIT_LOGS_FILE
+        self.checkpoint_file = config.AUDIT_CHECKPOINT_FILE
+        self.durability = config.AUDIT_DURABILITY
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"Modo de durabilidade da auditoria inválido: {self.durability}")
+        self.encryption = EncryptionService()
+        self._lock = threading.Lock()
+        self._verify_lock = threading.Lock()
+        self._full_verification_lock = threading.Lock()
+        self.full_verification = {'status': 'not_started'}
+
+        self.store = AuditSegmentStore()
+        self._migrate()
+
+        self.index = AuditIndex()
+        self.index.sync(self.store.count, self.store.iter_entries)
+        self.writer = AuditWriter(self._commit)
+        metrics.register_stats('audit_segments', self.store.get_stats)
+        metrics.register_stats('audit_writer', lambda: {'durability': self.durability, **self.writer.get_stats()})
         self._initialized = True
 
-    def _load_logs(self):
+    def _read_previous_logs(self):
+        # Arquivo único das versões anteriores: JSONL (só append) ou array JSON
         if self.log_file.exists():
-            try:
-                with open(self.log_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
+            with open(self.log_file, 'rb') as f:
+                for position, line in enumerate(f):
+                    # Só a última linha pode estar incompleta; linha completa inválida interrompe a migração
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        raise ValueError(f"Entrada corrompida no log #{position} de {self.log_file.name}")
+        elif self.legacy_log_file.exists():
+            with open(self.legacy_log_file, 'r', encoding='utf-8') as f:
+                try:
+                    logs = json.load(f)
+                except json.JSONDecodeError:
+                    raise ValueError(f"{self.legacy_log_file.name} corrompido; migração interrompida")
+            yield from logs
+
+    def _migrate(self):
+        """Copia o arquivo único antigo para os segmentos; entradas (e hashes) sem alteração.
 
-    def _save_logs(self):
-        with open(self.log_file, 'w', encoding='utf-8') as f:
-            json.dump(self.logs, f, indent=2, ensure_ascii=False)
+        Retomável: após uma queda no meio, as entradas já copiadas são puladas."""
+        source = self.log_file if self.log_file.exists() else self.legacy_log_file
+        if not source.exists():
+            return
+
+        for position, log in enumerate(self._read_previous_logs()):
+            if position >= self.store.count:
+                self.store.append(log, sync=False)
+        self.store.flush()
 
-    def _calculate_hash(self, log_entry, prev_hash):
-        data = json.dumps(log_entry, sort_keys=True) + prev_hash
-        return hashlib.sha256(data.encode()).hexdigest()
+        source.rename(source.with_name(source.name + '.migrated'))
 
     def add_log(self, event_type, user_id, decision, confidence=0.0,
-                reason="", mfa_used=False, ip_address="127.0.0.1"):
-        prev_hash = self.logs[-1]["hash"] if self.logs else "0" * 64
+                reason="", mfa_used=False, ip_address="127.0.0.1", timestamp=None, wait=None):
+        """Registra um evento conforme o modo de durabilidade e retorna o hash (None se não esperou).
 
+        wait=True aguarda o commit mesmo no modo 'async' (ex.: fluxos que precisam do hash)."""
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": timestamp or datetime.utcnow().isoformat() + "Z",
             "event_type": event_type,
             "user_id": user_id,
             "decision": decision,
@@ -53,46 +120,228 @@ class AuditService:
             "ip_address": ip_address
         }
 
-        log_hash = self._calculate_hash(log_entry, prev_hash)
-        log_entry["prev_hash"] = prev_hash
-        log_entry["hash"] = log_hash
+        if self.durability == 'sync':
+            hashes, error = self._commit([log_entry])
+            if not hashes:
+                raise error
+            return hashes[0]
+
+        future = self.writer.submit(log_entry)
+        if wait is None:
+            wait = self.durability == 'group'
+        return future.result() if wait else None
+
+    def flush(self):
+        """Aguarda a gravação das entradas ainda na fila do writer"""
+        self.writer.flush()
+
+    def _commit(self, entries):
+        """Encadeia na ordem recebida; um flush/fsync e um commit do índice por lote.
+
+        Retorna (hashes, erro): hashes das entradas que entraram na cadeia e a exceção que
+        interrompeu o lote (ou None). Entradas já na cadeia não podem ser reenviadas."""
+        with self._lock:
+            start = self.store.count
+            hashes = []
+            error = None
+
+            for log_entry in entries:
+                prev_hash = self.store.head_hash
+                log_hash = calculate_hash(log_entry, prev_hash)
+                log_entry["prev_hash"] = prev_hash
+                log_entry["hash"] = log_hash
+
+                try:
+                    self.store.append(log_entry, sync=False)
+                except Exception as e:
+                    error = e
+                    # Falha depois de contabilizar a entrada (ex.: ao selar o segmento): ela já está na cadeia
+                    if self.store.count > start + len(hashes):
+                        hashes.append(log_hash)
+                    break
+                hashes.append(log_hash)
+
+            if hashes:
+                # Falha aqui não tira as entradas da cadeia; o índice é realinhado na próxima carga
+                try:
+                    self.store.flush()
+                    self.index.add_many(start, entries[:len(hashes)])
+                except Exception as e:
+                    error = error or e
+
+        return hashes, error
+
+    def _load_checkpoint(self):
+        # Checkpoint criptografado (autenticado): não pode ser forjado para pular trechos da cadeia.
+        # None se não existe ou não pode ser lido; aí a verificação parte da gênese
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                checkpoint = json.loads(self.encryption.decrypt(f.read()))
+            return checkpoint['index'], checkpoint['hash']
+        except Exception:
+            return None
+
+    def _save_checkpoint(self, index, log_hash):
+        data = json.dumps({'index': index, 'hash': log_hash, 'verified_at': time.time()}).encode('utf-8')
+        tmp_path = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.encryption.encrypt(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def _verify_segment_seal(self, segment, leaves):
+        if merkle_root(leaves) != segment['merkle_root']:
+            return f"Raiz Merkle inválida no segmento #{segment['id']}"
+
+        prev_root = self.store.segments[segment['id'] - 1]['chain_root'] if segment['id'] else GENESIS_HASH
+        if chain_root(prev_root, segment['merkle_root']) != segment['chain_root']:
+            return f"Cadeia de segmentos quebrada no segmento #{segment['id']}"
+
+        return None
 
-        self.logs.append(log_entry)
-        self._save_logs()
+    def _verify_from(self, start, prev_hash):
+        """Verifica de start até o fim, um segmento por vez; retorna (válido, erro, posição final).
 
-        return log_hash
+        Segmentos selados percorridos desde o início também têm a raiz Merkle conferida."""
+        end = start
+        if self.store.corruption:
+            return False, self.store.corruption, end
+
+        for segment, entries in self.store.iter_segments(start):
+            whole_segment = segment is not None and start <= segment['first_position']
+            leaves = []
+
+            for index, log in entries:
+                expected_hash = calculate_hash(log, prev_hash)
+
+                if log["hash"] != expected_hash:
+                    return False, f"Hash inválido no log #{index}", end
+
+                if log["prev_hash"] != prev_hash:
+                    return False, f"Cadeia quebrada no log #{index}", end
+
+                prev_hash = log["hash"]
+                end = index + 1
+                if whole_segment:
+                    leaves.append(log["hash"])
+
+            if whole_segment:
+                error_msg = self._verify_segment_seal(segment, leaves)
+                if error_msg:
+                    return False, error_msg, end
+
+        return True, None, end
 
     def verify_integrity(self):
-        if not self.logs:
-            return True, None
+        """Verifica só as entradas gravadas depois do último checkpoint (e os segmentos que as contêm)"""
+        with self._verify_lock:
+            if self.store.corruption:
+                return False, self.store.corruption
 
-        prev_hash = "0" * 64
-        for index, log in enumerate(self.logs):
-            expected_hash = self._calculate_hash(
-                {k: v for k, v in log.items() if k not in ["prev_hash", "hash"]},
-                prev_hash
-            )
+            checkpoint = self._load_checkpoint()
+            if checkpoint is None:
+                index, checkpoint_hash = 0, GENESIS_HASH
+            else:
+                # Checkpoint autenticado que não bate com a trilha: entradas removidas ou alteradas
+                index, checkpoint_hash = checkpoint
+                if index > self.store.count:
+                    return False, f"Trilha com {self.store.count} logs, mas {index} já foram verificados"
+                if index > 0 and self.store.get(index - 1)["hash"] != checkpoint_hash:
+                    return False, f"Log #{index - 1} difere do verificado no último checkpoint"
 
-            if log["hash"] != expected_hash:
-                return False, f"Hash inválido no log #{index}"
+            is_valid, error_msg, end = self._verify_from(index, checkpoint_hash)
+            if is_valid and end > index:
+                self._save_checkpoint(end, self.store.get(end - 1)["hash"])
 
-            if log["prev_hash"] != prev_hash:
-                return False, f"Cadeia quebrada no log #{index}"
+            return is_valid, error_msg
+
+    def verify_full(self):
+        """Verificação completa desde a gênese (operação explícita, O(N))"""
+        with self._verify_lock:
+            is_valid, error_msg, end = self._verify_from(0, GENESIS_HASH)
+            if is_valid and end:
+                self._save_checkpoint(end, self.store.get(end - 1)["hash"])
+            return is_valid, error_msg, end
 
+    def verify_segment(self, segment_id):
+        """Verifica só um segmento selado: cadeia interna, raiz Merkle e encadeamento com o anterior"""
+        segment = self.store.segments[segment_id]
+        prev_hash = segment['first_prev_hash']
+        leaves = []
+
+        for index, log in self.store.iter_segment(segment_id):
+            if log["hash"] != calculate_hash(log, prev_hash) or log["prev_hash"] != prev_hash:
+                return False, f"Cadeia quebrada no log #{index}"
             prev_hash = log["hash"]
+            leaves.append(log["hash"])
+
+        if prev_hash != segment['last_hash']:
+            return False, f"Último hash não confere no segmento #{segment_id}"
+
+        error_msg = self._verify_segment_seal(segment, leaves)
+        if error_msg:
+            return False, error_msg
+
+        # Encadeamento das entradas com o segmento anterior
+        if segment_id and self.store.segments[segment_id - 1]['last_hash'] != segment['first_prev_hash']:
+            return False, f"Cadeia quebrada entre os segmentos #{segment_id - 1} e #{segment_id}"
 
         return True, None
 
-    def get_logs(self, limit=50, offset=0, user_id=None):
-        logs = self.logs
+    def start_full_verification(self):
+        """Dispara verify_full em segundo plano; o andamento fica em full_verification.
+
+        False se já há uma verificação em andamento (chamadas concorrentes iniciam no máximo uma)"""
+        with self._full_verification_lock:
+            if self.full_verification.get('status') == 'running':
+                return False
+            self.full_verification = {'status': 'running', 'started_at': time.time()}
+
+        def run():
+            try:
+                is_valid, error_msg, verified = self.verify_full()
+                status = 'passed' if is_valid else 'failed'
+            except Exception as e:
+                is_valid, error_msg, verified, status = False, str(e), 0, 'failed'
+
+            self.full_verification = {
+                **self.full_verification,
+                'status': status,
+                'error': error_msg,
+                'verified_entries': verified,
+                'finished_at': time.time()
+            }
 
-        if user_id:
-            logs = [log for log in logs if log.get('user_id') == user_id]
+        threading.Thread(target=run, name='audit-full-verify', daemon=True).start()
+        return True
 
-        logs = list(reversed(logs))
-        return logs[offset:offset + limit]
+    def query_logs(self, limit=50, offset=0, user_id=None, event_type=None, decision=None,
+                   since=None, until=None, before=None):
+        """Página de logs (mais recentes primeiro), total e posição do próximo cursor (None na última página).
+
+        since/until em epoch; before é a posição devolvida pela página anterior."""
+        positions, total = self.index.query(user_id, event_type, decision, since, until,
+                                            limit + 1, offset, before)
+
+        next_before = positions[limit - 1] if len(positions) > limit and limit > 0 else None
+        return self.store.get_many(positions[:limit]), total, next_before
+
+    def get_logs(self, limit=50, offset=0, user_id=None, **filters):
+        return self.query_logs(limit, offset, user_id, **filters)[0]
+
+    def get_total_logs(self, user_id=None, **filters):
+        if not user_id and not filters:
+            return self.store.count
+        return self.index.query(user_id, limit=0, **filters)[1]
+
+    def export_logs(self, start=0, **filters):
+        """Gera as entradas em ordem da cadeia (com prev_hash/hash), a partir da posição start"""
+        if not any(filters.values()):
+            # Sem filtros: percorre os segmentos em streaming, sem passar pelo índice
+            for _, log in self.store.iter_entries(start):
+                yield log
+            return
 
-    def get_total_logs(self, user_id=None):
-        if user_id:
-            return len([log for log in self.logs if log.get('user_id') == user_id])
-        return len(self.logs)
+        for position in self.index.iter_positions(start=start, **filters):
+            yield self.store.get(position)
@@ -0,0 +1,119 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import config
+from utils.metrics import metrics
+
+class AuditWriter:
+    """Group commit da auditoria: uma thread dedicada consome a fila na ordem de chegada e grava
+    cada lote (até max_batch entradas ou interval_ms de espera) com um único flush/fsync"""
+
+    def __init__(self, commit, interval_ms=config.AUDIT_GROUP_COMMIT_INTERVAL_MS,
+                 max_batch=config.AUDIT_GROUP_COMMIT_MAX_BATCH):
+        # commit(entradas) encadeia os hashes, grava e retorna (hashes das entradas gravadas, erro):
+        # numa falha no meio do lote, só as entradas não gravadas recebem a exceção
+        self.commit = commit
+        self.interval_seconds = interval_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._queue = Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.committed = 0
+        self.last_error = None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                # Entradas ainda na fila ao encerrar o processo são gravadas antes de sair
+                atexit.register(self.flush)
+
+    def submit(self, log_entry):
+        """Enfileira a entrada; o Future resolve com o hash depois do commit"""
+        self._ensure_started()
+
+        future = Future()
+        self._queue.put((log_entry, future))
+        return future
+
+    def flush(self, timeout=None):
+        """Aguarda o commit de tudo o que já foi enfileirado"""
+        if self._thread is None:
+            return
+
+        marker = Future()
+        self._queue.put((None, marker))
+        marker.result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.interval_seconds
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        # Com interval_ms = 0 o lote é só o que se acumulou durante o commit anterior
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            pending = [(log_entry, future) for log_entry, future in batch if log_entry is not None]
+
+            if pending:
+                try:
+                    with metrics.timer('audit.commit'):
+                        hashes, error = self.commit([log_entry for log_entry, _ in pending])
+                except Exception as e:
+                    hashes, error = [], e
+
+                if hashes:
+                    self.batches += 1
+                    self.committed += len(hashes)
+                for (_, future), log_hash in zip(pending, hashes):
+                    future.set_result(log_hash)
+
+                if error is not None:
+                    self.last_error = str(error)
+                    failed = pending[len(hashes):]
+                    metrics.increment('audit.commit_failed', len(failed))
+                    for _, future in failed:
+                        future.set_exception(error)
+
+            # Marcadores de flush: tudo o que veio antes deles já foi gravado
+            for log_entry, future in batch:
+                if log_entry is None:
+                    future.set_result(None)
+
+    def get_stats(self):
+        return {
+            'batches': self.batches,
+            'committed': self.committed,
+            'average_batch_size': self.committed / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize(),
+            'max_batch': self.max_batch,
+            'interval_ms': self.interval_seconds * 1000.0,
+            'last_error': self.last_error
+        }
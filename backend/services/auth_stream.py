@@ -0,0 +1,134 @@
+import threading
+import time
+import uuid
+
+import config
+from utils.image_utils import decode_image_bytes
+from utils.metrics import metrics
+
+class AuthStreamSession:
+    """Autenticação contínua sobre uma conexão persistente (ex.: WebSocket).
+
+    O cliente envia frames binários (JPEG/PNG); só o frame mais recente fica pendente, então
+    frames que chegam enquanto o anterior é processado substituem o pendente e são descartados.
+    Os resultados são enviados por `send` assim que produzidos. Após 'authenticated' ou
+    'mfa_required' a sessão pausa até `resume()` para não repetir autenticação e auditoria.
+
+    Depois de uma recusa o próximo frame só é processado após failure_window segundos (os que chegam
+    nesse intervalo substituem o pendente): cada frame comparado conta tentativa e é auditado, e o
+    cliente não ganha comparações extras com a galeria entre uma tentativa contada e outra."""
+
+    def __init__(self, service, send, session_id=None, failure_window=config.STREAM_FAILURE_WINDOW):
+        self.service = service
+        self.send = send
+        self.session_id = session_id or uuid.uuid4().hex
+        self.failure_window = failure_window
+        self._cooldown_until = 0.0
+
+        self._pending = None
+        self._paused = False
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name='auth-stream', daemon=True)
+        self._thread.start()
+
+    def push(self, frame_bytes):
+        with self._condition:
+            if self._closed:
+                return
+
+            self.frames_received += 1
+            metrics.increment('stream.frames_received')
+
+            if self._paused or self._pending is not None:
+                self.frames_dropped += 1
+                metrics.increment('stream.frames_dropped')
+            if self._paused:
+                return
+
+            self._pending = (self.frames_received, frame_bytes)
+            self._condition.notify()
+
+    def resume(self):
+        with self._condition:
+            self._paused = False
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._condition.notify()
+
+    def _next_frame(self):
+        with self._condition:
+            while not self._closed:
+                if self._pending is None:
+                    self._condition.wait()
+                    continue
+                delay = self._cooldown_until - time.monotonic()
+                if delay <= 0:
+                    break
+                self._condition.wait(delay)
+
+            if self._closed:
+                return None
+
+            frame, self._pending = self._pending, None
+            return frame
+
+    def _run(self):
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+
+            sequence, frame_bytes = frame
+            try:
+                event = self._process(sequence, frame_bytes)
+            except Exception as e:
+                event = {'type': 'error', 'frame': sequence, 'success': False, 'message': str(e)}
+
+            self.frames_processed += 1
+            metrics.increment('stream.frames_processed')
+
+            try:
+                self.send(event)
+            except Exception:
+                # Conexão encerrada pelo cliente
+                self.close()
+                return
+
+    def _process(self, sequence, frame_bytes):
+        image = decode_image_bytes(frame_bytes, config.MIN_IMAGE_SIZE)
+        if image is None:
+            return {'type': 'error', 'frame': sequence, 'success': False, 'message': "Imagem inválida ou corrompida"}
+
+        success, username, level, confidence, requires_mfa, msg = self.service.authenticate_user(
+            image, session_id=self.session_id
+        )
+
+        if not success:
+            with self._condition:
+                self._cooldown_until = time.monotonic() + self.failure_window
+            return {'type': 'result', 'frame': sequence, 'success': False, 'message': msg}
+
+        with self._condition:
+            self._paused = True
+
+        return {
+            'type': 'mfa_required' if requires_mfa else 'authenticated',
+            'frame': sequence,
+            'success': True,
+            'message': msg,
+            'data': {
+                'user': username,
+                'permission_level': level,
+                'confidence': round(confidence, 4),
+                'requires_mfa': requires_mfa
+            }
+        }
@@ -0,0 +1,192 @@
+import os
+import struct
+import threading
+import numpy as np
+from collections import OrderedDict
+
+import config
+
+class EmbeddingStore:
+    """Arquivo de embeddings float32 de largura fixa, criptografado em chunks independentes.
+
+    A linha N da galeria fica no chunk N // chunk_rows; cada chunk ocupa um slot de tamanho
+    fixo no arquivo, então atualizar um template regrava apenas o seu chunk."""
+
+    _MAGIC = b'FEMB'
+    _HEADER = struct.Struct('>4sHHII')
+
+    def __init__(self, encryption, path=config.EMBEDDINGS_FILE,
+                 dimension=config.EMBEDDING_DIMENSION, chunk_rows=config.EMBEDDING_CHUNK_ROWS,
+                 cache_chunks=config.EMBEDDING_CACHE_CHUNKS):
+        self.encryption = encryption
+        self.path = path
+        self.dimension = dimension
+        self.chunk_rows = chunk_rows
+        self.cache_chunks = cache_chunks
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+
+        self.slot_bytes = self._compute_slot_bytes()
+        self.chunk_count = self._read_header()
+        if self.chunk_count and self.chunk_rows != chunk_rows:
+            self._rechunk(chunk_rows)
+
+    @property
+    def chunk_bytes(self):
+        return self.chunk_rows * self.dimension * 4
+
+    @property
+    def row_count(self):
+        return self.chunk_count * self.chunk_rows
+
+    def _compute_slot_bytes(self):
+        # O token Fernet tem tamanho determinístico para um texto claro de tamanho fixo
+        return len(self.encryption.encrypt(bytes(self.chunk_bytes)))
+
+    def _chunk_offset(self, chunk):
+        return self._HEADER.size + chunk * self.slot_bytes
+
+    def _read_header(self):
+        if not self.path.exists() or self.path.stat().st_size < self._HEADER.size:
+            return 0
+
+        with open(self.path, 'rb') as f:
+            magic, _, dimension, chunk_rows, slot_bytes = self._HEADER.unpack(f.read(self._HEADER.size))
+
+        if magic != self._MAGIC:
+            raise ValueError("Arquivo de embeddings inválido")
+        if dimension != self.dimension:
+            raise ValueError(f"Dimensão dos embeddings incompatível ({dimension} != {self.dimension})")
+
+        self.chunk_rows = chunk_rows
+        self.slot_bytes = slot_bytes
+        return (self.path.stat().st_size - self._HEADER.size) // slot_bytes
+
+    def _rechunk(self, chunk_rows):
+        # Arquivo gravado com outro tamanho de chunk: regrava uma única vez no tamanho configurado
+        # (chunks menores = menos bytes descriptografados por linha lida no re-ranking)
+        old_rows, old_slot_bytes, old_count = self.chunk_rows, self.slot_bytes, self.chunk_count
+        self.chunk_rows = chunk_rows
+        self.slot_bytes = self._compute_slot_bytes()
+
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        chunk_count = 0
+        pending = np.empty((0, self.dimension), dtype=np.float32)
+        with open(self.path, 'rb') as src, open(tmp_path, 'wb') as f:
+            self._write_header(f)
+            src.seek(self._HEADER.size)
+            for _ in range(old_count):
+                block = np.frombuffer(self.encryption.decrypt(src.read(old_slot_bytes)), dtype=np.float32)
+                pending = np.concatenate([pending, block.reshape(old_rows, self.dimension)])
+                while len(pending) >= chunk_rows:
+                    f.write(self.encryption.encrypt(pending[:chunk_rows].tobytes()))
+                    pending = pending[chunk_rows:]
+                    chunk_count += 1
+
+            if len(pending):
+                block = np.zeros((chunk_rows, self.dimension), dtype=np.float32)
+                block[:len(pending)] = pending
+                f.write(self.encryption.encrypt(block.tobytes()))
+                chunk_count += 1
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.path)
+        self._cache.clear()
+        self.chunk_count = chunk_count
+
+    def _write_header(self, f):
+        f.seek(0)
+        f.write(self._HEADER.pack(self._MAGIC, 1, self.dimension, self.chunk_rows, self.slot_bytes))
+
+    def _decrypt_chunk(self, token):
+        plaintext = self.encryption.decrypt(token)
+        return np.frombuffer(plaintext, dtype=np.float32).reshape(self.chunk_rows, self.dimension)
+
+    def iter_chunks(self):
+        """Percorre o arquivo via np.memmap, descriptografando um chunk por vez: (linha inicial, bloco float32)"""
+        with self._lock:
+            if self.chunk_count == 0:
+                return
+
+            mapped = np.memmap(self.path, dtype=np.uint8, mode='r')
+            try:
+                for chunk in range(self.chunk_count):
+                    offset = self._chunk_offset(chunk)
+                    yield chunk * self.chunk_rows, self._decrypt_chunk(bytes(mapped[offset:offset + self.slot_bytes]))
+            finally:
+                del mapped
+
+    def _read_chunk(self, chunk):
+        block = self._cache.get(chunk)
+        if block is not None:
+            self._cache.move_to_end(chunk)
+            return block
+
+        if chunk >= self.chunk_count:
+            block = np.zeros((self.chunk_rows, self.dimension), dtype=np.float32)
+        else:
+            with open(self.path, 'rb') as f:
+                f.seek(self._chunk_offset(chunk))
+                block = self._decrypt_chunk(f.read(self.slot_bytes))
+
+        self._cache_chunk(chunk, block)
+        return block
+
+    def _cache_chunk(self, chunk, block):
+        if self.cache_chunks <= 0:
+            return
+
+        self._cache[chunk] = block
+        self._cache.move_to_end(chunk)
+        while len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+
+    def read_rows(self, rows):
+        with self._lock:
+            result = np.empty((len(rows), self.dimension), dtype=np.float32)
+            for i, row in enumerate(rows):
+                row = int(row)
+                result[i] = self._read_chunk(row // self.chunk_rows)[row % self.chunk_rows]
+            return result
+
+    def write_rows(self, rows, vectors):
+        """Regrava apenas os chunks que contêm as linhas informadas"""
+        with self._lock:
+            if len(rows) == 0:
+                return
+
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(rows), self.dimension)
+            updates = {}
+            for row, vector in zip(rows, vectors):
+                row = int(row)
+                updates.setdefault(row // self.chunk_rows, []).append((row % self.chunk_rows, vector))
+
+            # Chunks ainda inexistentes entre o fim do arquivo e o chunk alterado também são gravados
+            last_chunk = max(updates)
+            for chunk in range(self.chunk_count, last_chunk):
+                updates.setdefault(chunk, [])
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            mode = 'r+b' if self.path.exists() else 'w+b'
+            with open(self.path, mode) as f:
+                if self.chunk_count == 0:
+                    self._write_header(f)
+
+                for chunk in sorted(updates):
+                    block = self._read_chunk(chunk).copy()
+                    for offset, vector in updates[chunk]:
+                        block[offset] = vector
+
+                    f.seek(self._chunk_offset(chunk))
+                    f.write(self.encryption.encrypt(block.tobytes()))
+                    self._cache_chunk(chunk, block)
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.chunk_count = max(self.chunk_count, last_chunk + 1)
+
+    def clear_rows(self, rows):
+        self.write_rows(rows, np.zeros((len(rows), self.dimension), dtype=np.float32))
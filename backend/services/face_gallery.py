@@ -0,0 +1,275 @@
+import threading
+import numpy as np
+from datetime import datetime
+
+import config
+from .gallery_index import FlatIndex
+from .quantization import create_codec
+
+class FaceGallery:
+    def __init__(self, dimension=config.EMBEDDING_DIMENSION, initial_capacity=64, index=None,
+                 store=None, quantization=config.GALLERY_QUANTIZATION,
+                 rerank_candidates=config.GALLERY_RERANK_CANDIDATES):
+        self.dimension = dimension
+        self.index = index or FlatIndex()
+        self.store = store
+        self.codec = create_codec(quantization if store is not None else 'none', dimension)
+        self.rerank_candidates = rerank_candidates
+        self._lock = threading.RLock()
+        self._train_lock = threading.Lock()
+
+        # Matriz contígua (float32 ou compacta) com uma linha por template + índice linha -> usuário
+        self.codes = np.zeros((initial_capacity, dimension), dtype=self.codec.dtype)
+        self.active = np.zeros(initial_capacity, dtype=bool)
+        self.lockout_until = np.zeros(initial_capacity, dtype=np.float64)
+        self.row_users = [None] * initial_capacity
+
+        self.user_rows = {}
+        self._free_rows = []
+        self.size = 0
+        self.calibrated_size = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active[:self.size]))
+
+    @property
+    def memory_bytes(self):
+        return self.codes.nbytes
+
+    def active_rows(self):
+        return np.flatnonzero(self.active[:self.size])
+
+    def vectors(self, rows):
+        """Embeddings float32 exatos das linhas (da matriz residente ou do EmbeddingStore)"""
+        if self.codec.exact:
+            return self.codes[rows]
+        return self.store.read_rows(rows)
+
+    def _grow(self, min_capacity):
+        capacity = len(self.row_users)
+        while capacity < min_capacity:
+            capacity *= 2
+
+        codes = np.zeros((capacity, self.dimension), dtype=self.codec.dtype)
+        codes[:self.size] = self.codes[:self.size]
+        active = np.zeros(capacity, dtype=bool)
+        active[:self.size] = self.active[:self.size]
+        lockout_until = np.zeros(capacity, dtype=np.float64)
+        lockout_until[:self.size] = self.lockout_until[:self.size]
+
+        self.codes = codes
+        self.active = active
+        self.lockout_until = lockout_until
+        self.row_users.extend([None] * (capacity - len(self.row_users)))
+
+    def _allocate_row(self):
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        if self.size >= len(self.row_users):
+            self._grow(self.size + 1)
+
+        row = self.size
+        self.size += 1
+        return row
+
+    def add_user(self, name, embeddings, lockout_until=None):
+        with self._lock:
+            if name in self.user_rows:
+                self.remove_user(name)
+
+            vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+            rows = [self._allocate_row() for _ in range(len(vectors))]
+
+            # Persiste antes de expor as linhas: o re-ranking lê os float32 do EmbeddingStore
+            if self.store is not None:
+                self.store.write_rows(rows, vectors)
+
+            self.codes[rows] = self.codec.encode(vectors)
+            self.active[rows] = True
+            self.lockout_until[rows] = lockout_until or 0.0
+            for row in rows:
+                self.row_users[row] = name
+
+            self.user_rows[name] = rows
+            self.index.add(rows, vectors)
+            self._maybe_recalibrate()
+            return rows
+
+    def load(self, users):
+        """Carrega a galeria a partir do EmbeddingStore; users = (nome, linhas, lockout)"""
+        with self._lock:
+            capacity = max(self.store.row_count, len(self.row_users))
+            self.codes = np.zeros((capacity, self.dimension), dtype=self.codec.dtype)
+            self.active = np.zeros(capacity, dtype=bool)
+            self.lockout_until = np.zeros(capacity, dtype=np.float64)
+            self.row_users = [None] * capacity
+            self.user_rows = {}
+
+            # Máscaras preenchidas de uma vez no fim: por usuário só há trabalho em Python puro
+            loaded_rows = []
+            lockouts = []
+            for name, rows, lockout_until in users:
+                rows = [int(row) for row in rows]
+                for row in rows:
+                    self.row_users[row] = name
+                self.user_rows[name] = rows
+                loaded_rows.extend(rows)
+                lockouts.extend([lockout_until or 0.0] * len(rows))
+
+            self.active[loaded_rows] = True
+            self.lockout_until[loaded_rows] = lockouts
+
+            active_rows = np.flatnonzero(self.active)
+            self.size = int(active_rows[-1]) + 1 if len(active_rows) else 0
+            self._free_rows = np.flatnonzero(~self.active[:self.size])[::-1].tolist()
+
+            self._encode_from_store()
+
+            # Carga em lote: o índice atribui todas as linhas com um único produto matricial
+            # (a atribuição às listas pode usar os vetores decodificados da forma compacta)
+            self.index.add(active_rows, self.codec.decode(self.codes[active_rows]))
+
+    def _encode_from_store(self):
+        # Calibra a quantização com os primeiros chunks e codifica o restante em streaming
+        calibrated = self.codec.exact
+        pending = []
+        sampled = 0
+
+        chunks = self.store.iter_chunks()
+        try:
+            for start, block in chunks:
+                if start >= self.size:
+                    break
+                block = block[:len(self.codes) - start]
+
+                if calibrated:
+                    self.codes[start:start + len(block)] = self.codec.encode(block)
+                    continue
+
+                pending.append((start, block))
+                sampled += int(np.count_nonzero(self.active[start:start + len(block)]))
+                if sampled >= config.GALLERY_CALIBRATION_ROWS:
+                    self._calibrate_and_encode(pending)
+                    pending = []
+                    calibrated = True
+        finally:
+            chunks.close()
+
+        if pending:
+            self._calibrate_and_encode(pending)
+
+        self.calibrated_size = len(self)
+
+    def _calibrate_and_encode(self, blocks):
+        self.codec.calibrate(np.concatenate([
+            block[self.active[start:start + len(block)]] for start, block in blocks
+        ]))
+        for start, block in blocks:
+            self.codes[start:start + len(block)] = self.codec.encode(block)
+
+    def _maybe_recalibrate(self):
+        # A escala int8 é recalculada quando a galeria dobra desde a última calibração
+        if self.codec.exact or len(self) < 2 * max(self.calibrated_size, 1):
+            return
+
+        self._encode_from_store()
+
+    def remove_user(self, name):
+        with self._lock:
+            rows = self.user_rows.pop(name, [])
+            self.index.remove(rows)
+            for row in rows:
+                self.codes[row] = 0
+                self.active[row] = False
+                self.lockout_until[row] = 0.0
+                self.row_users[row] = None
+                self._free_rows.append(row)
+
+            if rows and self.store is not None:
+                self.store.clear_rows(rows)
+            return rows
+
+    def set_lockout(self, name, lockout_until):
+        with self._lock:
+            rows = self.user_rows.get(name)
+            if rows:
+                self.lockout_until[rows] = lockout_until or 0.0
+
+    def retrain_index(self):
+        """Retreina o índice quando a galeria cresceu o bastante. O k-means roda fora do lock sobre
+        uma cópia; as listas novas são montadas e trocadas sob o lock, então um match concorrente
+        nunca vê o índice vazio e linhas cadastradas durante o treino não se perdem"""
+        with self._train_lock:
+            with self._lock:
+                if not self.index.needs_training(len(self)):
+                    return False
+                # Vetores decodificados da matriz residente (como na carga): sem ler o EmbeddingStore
+                vectors = self.codec.decode(self.codes[self.active_rows()])
+
+            centroids = self.index.fit(vectors)
+
+            with self._lock:
+                rows = self.active_rows()
+                self.index.reset(centroids, len(vectors))
+                self.index.add(rows, self.codec.decode(self.codes[rows]))
+            return True
+
+    def _coarse_scores(self, rows, query):
+        # Em blocos, para limitar a cópia temporária float32 das linhas compactas
+        # (rows = None: todas as linhas até size, por fatias contíguas sem cópia)
+        block = config.GALLERY_SCORE_BLOCK_ROWS
+        if rows is None:
+            return np.concatenate([
+                self.codec.score(self.codes[i:min(i + block, self.size)], query)
+                for i in range(0, self.size, block)
+            ])
+        if len(rows) <= block:
+            return self.codec.score(self.codes[rows], query)
+        return np.concatenate([
+            self.codec.score(self.codes[rows[i:i + block]], query)
+            for i in range(0, len(rows), block)
+        ])
+
+    def match(self, embedding):
+        """Retorna (usuário, similaridade) do template mais próximo entre usuários não bloqueados"""
+        with self._lock:
+            if self.size == 0:
+                return None, -1.0
+
+            query = np.asarray(embedding, dtype=np.float32)
+
+            # O índice devolve linhas candidatas (None = todas)
+            rows = self.index.candidates(query)
+            now = datetime.now().timestamp()
+
+            if rows is None:
+                # Busca exata: pontua a matriz contígua inteira e descarta inativos/bloqueados pela máscara
+                eligible = self.active[:self.size] & (self.lockout_until[:self.size] <= now)
+                if not eligible.any():
+                    return None, -1.0
+
+                scores = np.where(eligible, self._coarse_scores(None, query), -np.inf)
+                candidates = int(np.count_nonzero(eligible))
+                rows = np.arange(self.size)
+            else:
+                if len(rows) == 0:
+                    return None, -1.0
+
+                mask = self.active[rows] & (self.lockout_until[rows] <= now)
+                if not mask.any():
+                    return None, -1.0
+
+                rows = rows[mask]
+                scores = self._coarse_scores(rows, query)
+                candidates = len(rows)
+
+            # Pontuação grossa na forma compacta; re-ranking exato em float32 só dos melhores candidatos
+            if not self.codec.exact:
+                k = min(self.rerank_candidates, candidates)
+                if len(rows) > k:
+                    rows = rows[np.argpartition(-scores, k - 1)[:k]]
+                scores = self.vectors(rows) @ query
+
+            best = int(np.argmax(scores))
+            return self.row_users[rows[best]], float(scores[best])
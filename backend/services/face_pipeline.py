@@ -0,0 +1,109 @@
+from collections import defaultdict, namedtuple
+
+import config
+from utils.image_utils import crop_face, downscale_for_detection, preprocess_image, select_largest_face
+from utils.metrics import metrics
+
+# source: imagem de onde sai o recorte da face; detection_image: entrada do detector;
+# scale: source/detection_image; offset: posição de source no frame original (ROI de rastreamento)
+PreparedFrame = namedtuple('PreparedFrame', ['source', 'detection_image', 'scale', 'offset', 'input_size'])
+
+class FacePipeline:
+    """Pré-processamento, detecção e embedding com tempos por etapa.
+
+    Modo 'roi': detecção em uma cópia reduzida do frame e realce (CLAHE + bilateral) só no recorte da face.
+    Modo 'full': realce do frame inteiro antes da detecção (pipeline original).
+    A ROI de rastreamento só restringe a detecção: em 'full' o frame inteiro continua sendo realçado
+    e o recorte sai da imagem realçada, então o embedding tem a mesma entrada dos templates cadastrados."""
+
+    def __init__(self, detector, embedder, mode=config.PREPROCESSING_MODE,
+                 detection_max_width=config.DETECTION_MAX_WIDTH,
+                 confidence_threshold=config.MIN_FACE_CONFIDENCE,
+                 roi_input_size=config.TRACKING_ROI_INPUT_SIZE, stage_metrics=None):
+        if mode not in ('roi', 'full'):
+            raise ValueError(f"Modo de pré-processamento desconhecido: {mode}")
+
+        self.detector = detector
+        self.embedder = embedder
+        self.mode = mode
+        self.detection_max_width = detection_max_width
+        self.confidence_threshold = confidence_threshold
+        self.roi_input_size = roi_input_size
+        self.metrics = stage_metrics or metrics
+
+    def prepare(self, image, roi=None):
+        """Etapa executada na thread da requisição; roi=(x, y, w, h) restringe a detecção a um recorte"""
+        if self.mode == 'full':
+            # CLAHE e bilateral dependem da vizinhança: realçar só o recorte mudaria o embedding
+            with self.metrics.timer('preprocess.enhance_full'):
+                image = preprocess_image(image)
+
+        offset = (0, 0)
+        input_size = (300, 300)
+        if roi is not None:
+            x, y, w, h = roi
+            image = image[y:y + h, x:x + w]
+            offset = (x, y)
+            input_size = self.roi_input_size
+
+        if self.mode == 'full':
+            return PreparedFrame(image, image, 1.0, offset, input_size)
+
+        with self.metrics.timer('preprocess.downscale'):
+            small, scale = downscale_for_detection(image, self.detection_max_width)
+        return PreparedFrame(image, small, scale, offset, input_size)
+
+    def detect_batch(self, frames):
+        # Frames com tamanhos de entrada diferentes (frame inteiro x ROI) vão em forwards separados
+        groups = defaultdict(list)
+        for i, frame in enumerate(frames):
+            groups[frame.input_size].append(i)
+
+        detections = [None] * len(frames)
+        with self.metrics.timer('inference.detect'):
+            for input_size, indices in groups.items():
+                results = self.detector.detect_batch(
+                    [frames[i].detection_image for i in indices], self.confidence_threshold, input_size
+                )
+                for i, faces in zip(indices, results):
+                    detections[i] = faces
+
+        bboxes = []
+        for frame, faces in zip(frames, detections):
+            face_bbox = select_largest_face(faces)
+            if face_bbox is not None and frame.scale != 1.0:
+                height, width = frame.source.shape[:2]
+                x, y, w, h = (int(round(v * frame.scale)) for v in face_bbox)
+                face_bbox = (x, y, min(w, width - x), min(h, height - y))
+            bboxes.append(face_bbox)
+
+        return bboxes
+
+    def embed_batch(self, frames, bboxes):
+        crops = [crop_face(frame.source, face_bbox) for frame, face_bbox in zip(frames, bboxes)]
+
+        if self.mode == 'roi':
+            with self.metrics.timer('preprocess.enhance_roi'):
+                crops = [preprocess_image(crop) for crop in crops]
+
+        with self.metrics.timer('inference.embed'):
+            return self.embedder.extract_batch(crops)
+
+    def process_batch(self, frames):
+        """Retorna (bbox, embedding) por frame preparado, ou (None, None) sem face; bbox em coordenadas do frame original"""
+        bboxes = self.detect_batch(frames)
+        with_face = [i for i, face_bbox in enumerate(bboxes) if face_bbox is not None]
+
+        results = [(None, None)] * len(frames)
+        if with_face:
+            embeddings = self.embed_batch([frames[i] for i in with_face], [bboxes[i] for i in with_face])
+            for i, embedding in zip(with_face, embeddings):
+                x, y, w, h = bboxes[i]
+                offset_x, offset_y = frames[i].offset
+                results[i] = ((x + offset_x, y + offset_y, w, h), embedding)
+
+        return results
+
+    def run(self, image, roi=None):
+        with self.metrics.timer('pipeline.total'):
+            return self.process_batch([self.prepare(image, roi)])[0]
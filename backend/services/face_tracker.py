@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+class _TrackState:
+    __slots__ = ('bbox', 'frame_shape', 'frames_since_full', 'last_seen')
+
+    def __init__(self, bbox, frame_shape):
+        self.bbox = bbox
+        self.frame_shape = frame_shape
+        self.frames_since_full = 0
+        self.last_seen = time.monotonic()
+
+class FaceTracker:
+    """Última caixa de face por sessão de cliente, para detectar só em uma ROI em volta dela.
+
+    Uma detecção no frame inteiro é feita a cada `full_detect_interval` frames, quando a sessão
+    expira, quando o tamanho do frame muda ou quando a face some da ROI."""
+
+    def __init__(self, padding=config.TRACKING_ROI_PADDING,
+                 full_detect_interval=config.TRACKING_FULL_DETECT_INTERVAL,
+                 session_ttl=config.TRACKING_SESSION_TTL,
+                 max_sessions=config.TRACKING_MAX_SESSIONS):
+        self.padding = padding
+        self.full_detect_interval = full_detect_interval
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def roi_for(self, session_id, frame_shape):
+        """Retorna a ROI (x, y, w, h) para o próximo frame da sessão, ou None para detectar no frame inteiro"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return None
+
+            if (time.monotonic() - state.last_seen > self.session_ttl
+                    or state.frame_shape != frame_shape[:2]
+                    or state.frames_since_full >= self.full_detect_interval):
+                return None
+
+            x, y, w, h = state.bbox
+
+        margin = int(max(w, h) * self.padding)
+        height, width = frame_shape[:2]
+        x1 = max(0, x - margin)
+        y1 = max(0, y - margin)
+        x2 = min(width, x + w + margin)
+        y2 = min(height, y + h + margin)
+        return x1, y1, x2 - x1, y2 - y1
+
+    def update(self, session_id, frame_shape, face_bbox, full_detection):
+        with self._lock:
+            if face_bbox is None:
+                self._sessions.pop(session_id, None)
+                return
+
+            state = self._sessions.pop(session_id, None)
+            if state is None or full_detection:
+                state = _TrackState(face_bbox, frame_shape[:2])
+            else:
+                state.bbox = face_bbox
+                state.frames_since_full += 1
+                state.last_seen = time.monotonic()
+
+            self._sessions[session_id] = state
+            self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - state.last_seen <= self.session_ttl:
+                break
+            del self._sessions[session_id]
+
@@ -1,45 +1,67 @@
 import cv2
 import json
 import numpy as np
-import pickle
 from datetime import datetime
 from pathlib import Path
 
 import config
 from models.user import User
-from utils.image_utils import preprocess_image
-from .audit_service import AuditService
+from utils.metrics import metrics
+from .audit_service import get_audit_service
+from .embedding_store import EmbeddingStore
 from .encryption_service import EncryptionService
+from .face_gallery import FaceGallery
+from .face_pipeline import FacePipeline
+from .face_tracker import FaceTracker
+from .frame_cache import FrameCache
+from .gallery_index import create_gallery_index
+from .inference_scheduler import InferenceBatcher
+from .inference_workers import InferenceWorkerPool
+from .login_state_store import LoginStateStore
 from .mfa_service import MFAService
+from .net_pool import NetPool, configure_net, configure_opencv_threads
+from .quality_gate import QualityGate
+from .readiness import readiness
+from .task_queue import TaskQueue
+from .user_store import UserStore
 
 class FaceDetectorDNN:
-    def __init__(self):
+    def __init__(self, backend=config.DNN_BACKEND, target=config.DNN_TARGET, pool_size=config.DNN_POOL_SIZE):
         prototxt = str(config.FACE_DETECTION_PROTOTXT)
         caffemodel = str(config.FACE_DETECTION_MODEL)
 
         if not Path(prototxt).exists() or not Path(caffemodel).exists():
             raise FileNotFoundError(f"Modelos de detecção não encontrados")
 
-        self.net = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
+        self.pool = NetPool(
+            lambda: configure_net(cv2.dnn.readNetFromCaffe(prototxt, caffemodel), backend, target),
+            size=pool_size
+        )
 
-    def detect(self, image, confidence_threshold=0.5):
-        h, w = image.shape[:2]
+    def detect(self, image, confidence_threshold=0.5, input_size=(300, 300)):
+        return self.detect_batch([image], confidence_threshold, input_size)[0]
 
-        blob = cv2.dnn.blobFromImage(
-            cv2.resize(image, (300, 300)),
+    def detect_batch(self, images, confidence_threshold=0.5, input_size=(300, 300)):
+        # O SSD aceita entradas menores que 300x300 (ex.: ROI de rastreamento onde a face ocupa boa parte do recorte)
+        blob = cv2.dnn.blobFromImages(
+            [cv2.resize(image, input_size) for image in images],
             1.0,
-            (300, 300),
+            input_size,
             (104.0, 177.0, 123.0)
         )
 
-        self.net.setInput(blob)
-        detections = self.net.forward()
+        with self.pool.checkout() as net:
+            net.setInput(blob)
+            detections = net.forward()
 
-        faces = []
+        # Saída [1, 1, N, 7]: a coluna 0 identifica a imagem do lote
+        results = [[] for _ in images]
         for i in range(detections.shape[2]):
+            image_id = int(detections[0, 0, i, 0])
             confidence = detections[0, 0, i, 2]
 
-            if confidence > confidence_threshold:
+            if confidence > confidence_threshold and 0 <= image_id < len(images):
+                h, w = images[image_id].shape[:2]
                 box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
                 (x1, y1, x2, y2) = box.astype("int")
 
@@ -49,22 +71,34 @@ class FaceDetectorDNN:
                 height = min(h - y, y2 - y1)
 
                 if width > 0 and height > 0:
-                    faces.append((x, y, width, height))
+                    results[image_id].append((x, y, width, height))
 
-        return faces
+        return results
+
+    def warm_up(self, input_sizes=((300, 300),)):
+        for input_size in input_sizes:
+            blob = cv2.dnn.blobFromImage(np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8),
+                                         1.0, input_size, (104.0, 177.0, 123.0))
+            self.pool.warm_up(lambda net: (net.setInput(blob), net.forward()))
 
 class FaceEmbedder:
-    def __init__(self):
+    def __init__(self, backend=config.DNN_BACKEND, target=config.DNN_TARGET, pool_size=config.DNN_POOL_SIZE):
         model_path = str(config.FACENET_MODEL)
 
         if not Path(model_path).exists():
             raise FileNotFoundError(f"Modelo FaceNet não encontrado")
 
-        self.net = cv2.dnn.readNetFromTorch(model_path)
+        self.pool = NetPool(
+            lambda: configure_net(cv2.dnn.readNetFromTorch(model_path), backend, target),
+            size=pool_size
+        )
 
     def extract(self, face_image):
-        face_blob = cv2.dnn.blobFromImage(
-            face_image,
+        return self.extract_batch([face_image])[0]
+
+    def extract_batch(self, face_images):
+        face_blob = cv2.dnn.blobFromImages(
+            face_images,
             1.0 / 255,
             (96, 96),
             (0, 0, 0),
@@ -72,13 +106,19 @@ class FaceEmbedder:
             crop=False
         )
 
-        self.net.setInput(face_blob)
-        embedding = self.net.forward()
+        with self.pool.checkout() as net:
+            net.setInput(face_blob)
+            embeddings = net.forward()
 
-        embedding = embedding.flatten()
-        embedding = embedding / np.linalg.norm(embedding)
+        embeddings = embeddings.reshape(len(face_images), -1)
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
 
-        return embedding
+        return embeddings
+
+    def warm_up(self):
+        blob = cv2.dnn.blobFromImage(np.zeros((96, 96, 3), dtype=np.uint8), 1.0 / 255, (96, 96),
+                                     (0, 0, 0), swapRB=True, crop=False)
+        self.pool.warm_up(lambda net: (net.setInput(blob), net.forward()))
 
 class FacialRecognitionService:
     _instance = None
@@ -93,74 +133,133 @@ class FacialRecognitionService:
         if self._initialized:
             return
 
-        self.detector = FaceDetectorDNN()
-        self.embedder = FaceEmbedder()
+        configure_opencv_threads()
+        if config.INFERENCE_BACKEND == 'process':
+            # Os modelos vivem só nos workers (INFERENCE_WORKER_START_METHOD: forkserver/spawn por padrão)
+            self.workers = InferenceWorkerPool()
+            self.detector = None
+            self.embedder = None
+            self.pipeline = None
+            self.batcher = None
+        else:
+            self.workers = None
+            self.detector = FaceDetectorDNN()
+            self.embedder = FaceEmbedder()
+            self.pipeline = FacePipeline(self.detector, self.embedder)
+            self.batcher = InferenceBatcher(self.pipeline) if config.INFERENCE_BATCHING else None
+        readiness.mark('models')
+        self.quality_gate = QualityGate() if config.QUALITY_GATE_ENABLED else None
+        self.tracker = FaceTracker() if config.TRACKING_ENABLED else None
+        self.frame_cache = FrameCache() if config.FRAME_CACHE_ENABLED else None
         self.encryption = EncryptionService()
         self.mfa_service = MFAService()
-        self.audit_service = AuditService()
+        self.audit_service = get_audit_service()
 
         self.encodings_file = config.ENCODINGS_FILE
+        self.user_store = UserStore(self.encryption)
+        self.login_state = LoginStateStore()
+        self.embedding_store = EmbeddingStore(self.encryption)
+        self.index_file = config.GALLERY_INDEX_FILE
         self.known_faces_dir = config.KNOWN_FACES_DIR
         self.config_file = config.CONFIG_JSON_FILE
 
         self.users = self._load_users()
+        self.gallery = self._build_gallery()
+        readiness.mark('gallery')
         self.thresholds = self._load_thresholds()
 
+        # Efeitos colaterais do cadastro que não definem a resposta
+        self.tasks = TaskQueue(self.encryption)
+        self.tasks.register('reference_image', self._persist_reference_image)
+        self.tasks.register('audit', self._append_audit_log, retry_forever=True)  # a trilha não pode perder eventos
+        self.tasks.register('index_retrain', self._retrain_index)
+        self.tasks.start()
+
         self._initialized = True
 
-    def _load_users(self):
-        if not self.encodings_file.exists():
-            return {}
+    def close(self):
+        """Encerra o que o serviço iniciou; tolera uma construção interrompida no meio"""
+        workers = getattr(self, 'workers', None)
+        if workers:
+            workers.close()
+        tasks = getattr(self, 'tasks', None)
+        if tasks:
+            tasks.close()
+        user_store = getattr(self, 'user_store', None)
+        if user_store:
+            user_store.close()
 
+    def _load_users(self):
         try:
-            with open(self.encodings_file, 'rb') as f:
-                encrypted_data = f.read()
-
-            decrypted_data = self.encryption.decrypt(encrypted_data)
-            data = pickle.loads(decrypted_data)
-
-            users = {}
-            for name, user_data in data.items():
-                user = User(
-                    name=user_data['name'],
-                    permission_level=user_data['permission_level'],
-                    face_encodings=user_data['face_encodings'],
-                    mfa_secret=user_data.get('mfa_secret'),
-                    enrolled_date=user_data.get('enrolled_date'),
-                    last_access=user_data.get('last_access'),
-                    failed_attempts=user_data.get('failed_attempts', 0),
-                    lockout_until=user_data.get('lockout_until')
-                )
-                users[name] = user
-
-            return users
-        except:
+            data = self.user_store.load(legacy_file=self.encodings_file)
+        except ValueError:
+            raise  # base de usuários corrompida: não subir vazio (erro exposto em /api/ready)
+        except Exception:
             return {}
 
-    def _save_users(self):
-        try:
-            self.encodings_file.parent.mkdir(parents=True, exist_ok=True)
-
-            data = {}
-            for name, user in self.users.items():
-                data[name] = {
-                    'name': user.name,
-                    'permission_level': user.permission_level,
-                    'face_encodings': user.face_encodings,
-                    'mfa_secret': user.mfa_secret,
-                    'enrolled_date': user.enrolled_date,
-                    'last_access': user.last_access,
-                    'failed_attempts': user.failed_attempts,
-                    'lockout_until': user.lockout_until
-                }
+        # Registros antigos ainda carregam o estado de login; o LoginStateStore prevalece
+        login_state = self.login_state.load_all()
+
+        users = {}
+        for name, user_data in data.items():
+            user_data = {**user_data, **login_state.get(name, {})}
+            user = User(
+                name=user_data['name'],
+                permission_level=user_data['permission_level'],
+                face_encodings=user_data.get('face_encodings', []),
+                template_rows=user_data.get('template_rows', []),
+                mfa_secret=user_data.get('mfa_secret'),
+                enrolled_date=user_data.get('enrolled_date'),
+                last_access=user_data.get('last_access'),
+                failed_attempts=user_data.get('failed_attempts', 0),
+                lockout_until=user_data.get('lockout_until')
+            )
+            users[name] = user
+
+        return users
+
+    def _build_gallery(self):
+        index = create_gallery_index()
+        index.load(self.index_file, self.encryption)
+
+        gallery = FaceGallery(index=index, store=self.embedding_store)
+        gallery.load([
+            (user.name, user.template_rows, user.lockout_until)
+            for user in self.users.values() if user.template_rows
+        ])
+
+        # Registros legados (embeddings dentro do registro do usuário): migrar para o EmbeddingStore
+        for user in self.users.values():
+            if user.face_encodings and not user.template_rows:
+                user.template_rows = gallery.add_user(user.name, user.face_encodings, user.lockout_until)
+                user.face_encodings = []
+                self._save_user(user)
+                self._save_login_state(user)
+
+        self._train_index(gallery)
+        return gallery
+
+    def _train_index(self, gallery):
+        if gallery.retrain_index():
+            gallery.index.save(self.index_file, self.encryption)
 
-            pickled_data = pickle.dumps(data)
-            encrypted_data = self.encryption.encrypt(pickled_data)
+    def _save_user(self, user):
+        try:
+            self.user_store.put(user.name, {
+                'name': user.name,
+                'permission_level': user.permission_level,
+                'template_rows': user.template_rows,
+                'mfa_secret': user.mfa_secret,
+                'enrolled_date': user.enrolled_date
+            })
+        except Exception as e:
+            raise RuntimeError(f"Erro ao salvar usuário: {str(e)}")
 
-            with open(self.encodings_file, 'wb') as f:
-                f.write(encrypted_data)
+    def _save_login_state(self, user):
+        try:
+            self.login_state.save(user)
         except Exception as e:
-            raise RuntimeError(f"Erro ao salvar usuários: {str(e)}")
+            raise RuntimeError(f"Erro ao salvar estado de login: {str(e)}")
 
     def _load_thresholds(self):
         default_thresholds = {1: 0.70, 2: 0.80, 3: 0.85}
@@ -196,30 +295,95 @@ class FacialRecognitionService:
         except Exception as e:
             raise RuntimeError(f"Erro ao salvar configurações: {str(e)}")
 
-    def detect_face(self, image):
-        faces = self.detector.detect(image, confidence_threshold=config.MIN_FACE_CONFIDENCE)
-
-        if len(faces) == 0:
-            return None
-
-        return max(faces, key=lambda f: f[2] * f[3])
-
-    def extract_embedding(self, image, face_bbox):
-        x, y, w, h = face_bbox
-
-        margin = int(max(w, h) * 0.2)
-        x1 = max(0, x - margin)
-        y1 = max(0, y - margin)
-        x2 = min(image.shape[1], x + w + margin)
-        y2 = min(image.shape[0], y + h + margin)
+    def warm_up(self):
+        """Forward sintético no detector (frame inteiro e ROI) e no embedder de cada réplica"""
+        if self.workers:
+            self.workers.warm_up()
+            return
 
-        face_image = image[y1:y2, x1:x2]
+        self.detector.warm_up(((300, 300), config.TRACKING_ROI_INPUT_SIZE))
+        self.embedder.warm_up()
+
+    def check_quality(self, image):
+        if not self.quality_gate:
+            return True, "OK"
+
+        passed, _, message = self.quality_gate.check(image)
+        return passed, message
+
+    def detect_and_embed(self, image, roi=None):
+        if self.workers:
+            return self.workers.submit(image, roi)
+
+        if self.batcher:
+            # A preparação (redução/realce) roda na thread da requisição; os forwards são agrupados em lote
+            with metrics.timer('pipeline.total'):
+                return self.batcher.submit(self.pipeline.prepare(image, roi))
+
+        return self.pipeline.run(image, roi)
+
+    def track_and_embed(self, image, session_id=None):
+        """Como detect_and_embed, mas detecta só em volta da última face da sessão quando possível"""
+        if not self.tracker or not session_id:
+            return self.detect_and_embed(image)
+
+        roi = self.tracker.roi_for(session_id, image.shape)
+        if roi is not None:
+            face_bbox, embedding = self.detect_and_embed(image, roi)
+            if face_bbox is not None:
+                metrics.increment('tracking.roi_hits')
+                self.tracker.update(session_id, image.shape, face_bbox, full_detection=False)
+                return face_bbox, embedding
+
+            # A face saiu da ROI: refazer a detecção no frame inteiro
+            metrics.increment('tracking.roi_misses')
+
+        metrics.increment('tracking.full_detections')
+        face_bbox, embedding = self.detect_and_embed(image)
+        self.tracker.update(session_id, image.shape, face_bbox, full_detection=True)
+        return face_bbox, embedding
+
+    def embed_frame(self, image, session_id=None):
+        """(bbox, embedding) do frame, reaproveitando o resultado de um frame idêntico recente"""
+        if not self.frame_cache:
+            return self.track_and_embed(image, session_id)
+
+        keys = self.frame_cache.keys(image, session_id)
+        result = self.frame_cache.get(keys)
+        if result is None:
+            result = self.track_and_embed(image, session_id)
+            self.frame_cache.put(keys, result)
+        return result
+
+    def _audit_later(self, **log):
+        # O timestamp é o do evento, não o da gravação pela fila
+        log.setdefault('timestamp', datetime.utcnow().isoformat() + "Z")
+        self.tasks.enqueue('audit', log)
+
+    def _append_audit_log(self, log):
+        # A tarefa só conclui depois do commit, mesmo com AUDIT_DURABILITY = 'async'
+        self.audit_service.add_log(**log, wait=True)
+
+    def _retrain_index(self, payload):
+        # k-means fora da requisição de cadastro; até a troca das listas o match usa o índice atual
+        self._train_index(self.gallery)
+
+    def _persist_reference_image(self, payload):
+        # O usuário pode ter sido removido (ou recadastrado) antes da tarefa rodar
+        user = self.users.get(payload['name'])
+        if not user or user.enrolled_date != payload['enrolled_date']:
+            return
 
-        return self.embedder.extract(face_image)
+        image_path = self.known_faces_dir / f"{payload['name']}.jpg"
+        temp_path = image_path.with_suffix('.jpg.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(payload['jpeg'])
+        temp_path.replace(image_path)
 
     def enroll_user(self, name, security_level, image):
+        """Retorna (sucesso, mensagem, dados do MFA: {'qr_code'} ou {'qr_token'} ou None)"""
         if name in self.users:
-            self.audit_service.add_log(
+            self._audit_later(
                 event_type="enrollment",
                 user_id=name,
                 decision="denied",
@@ -227,11 +391,19 @@ class FacialRecognitionService:
             )
             return False, "Usuário já cadastrado", None
 
-        processed_image = preprocess_image(image)
+        passed, message = self.check_quality(image)
+        if not passed:
+            self._audit_later(
+                event_type="enrollment",
+                user_id=name,
+                decision="denied",
+                reason=f"Imagem rejeitada: {message}"
+            )
+            return False, message, None
 
-        face_bbox = self.detect_face(processed_image)
+        face_bbox, embedding = self.detect_and_embed(image)
         if not face_bbox:
-            self.audit_service.add_log(
+            self._audit_later(
                 event_type="enrollment",
                 user_id=name,
                 decision="denied",
@@ -239,42 +411,64 @@ class FacialRecognitionService:
             )
             return False, "Nenhuma face detectada na imagem", None
 
-        embedding = self.extract_embedding(processed_image, face_bbox)
-
         user = User(
             name=name,
-            permission_level=security_level,
-            face_encodings=[embedding.tolist()]
+            permission_level=security_level
         )
 
-        qr_code = None
+        mfa_setup = None
         if user.requires_mfa():
             secret = self.mfa_service.generate_secret(name)
             user.mfa_secret = secret
-            qr_code = self.mfa_service.generate_qr_code(name, secret)
+            if config.ENROLL_QR_DEFERRED:
+                mfa_setup = {'qr_token': self.mfa_service.create_qr_token(name)}
+            else:
+                mfa_setup = {'qr_code': self.mfa_service.generate_qr_code(name, secret)}
 
         self.users[name] = user
-        self._save_users()
-
-        try:
-            image_path = self.known_faces_dir / f"{name}.jpg"
-            cv2.imwrite(str(image_path), image)
-        except:
-            pass
-
-        self.audit_service.add_log(
+        user.template_rows = self.gallery.add_user(name, [embedding])
+        if self.gallery.index.needs_training(len(self.gallery)):
+            self.tasks.enqueue('index_retrain', {})
+        self._save_user(user)
+        self._save_login_state(user)
+
+        success, jpeg = cv2.imencode('.jpg', image)
+        if success:
+            self.tasks.enqueue('reference_image', {
+                'name': name,
+                'enrolled_date': user.enrolled_date,
+                'jpeg': jpeg.tobytes()
+            })
+
+        self._audit_later(
             event_type="enrollment",
             user_id=name,
             decision="granted",
             reason=f"Cadastro realizado (nível {security_level})"
         )
 
-        return True, "Usuário cadastrado com sucesso", qr_code
+        return True, "Usuário cadastrado com sucesso", mfa_setup
+
+    def get_mfa_qr_code(self, qr_token):
+        username = self.mfa_service.resolve_qr_token(qr_token)
+        secret = self.mfa_service.get_secret(username) if username else None
+        if not secret:
+            return None
 
-    def authenticate_user(self, image):
-        processed_image = preprocess_image(image)
+        return self.mfa_service.generate_qr_code(username, secret)
+
+    def authenticate_user(self, image, session_id=None):
+        passed, message = self.check_quality(image)
+        if not passed:
+            self.audit_service.add_log(
+                event_type="authentication",
+                user_id=None,
+                decision="denied",
+                reason=f"Imagem rejeitada: {message}"
+            )
+            return False, None, 0, 0.0, False, message
 
-        face_bbox = self.detect_face(processed_image)
+        face_bbox, embedding = self.embed_frame(image, session_id)
         if not face_bbox:
             self.audit_service.add_log(
                 event_type="authentication",
@@ -284,22 +478,8 @@ class FacialRecognitionService:
             )
             return False, None, 0, 0.0, False, "Nenhuma face detectada"
 
-        embedding = self.extract_embedding(processed_image, face_bbox)
-
-        best_match = None
-        best_similarity = -1.0
-
-        for name, user in self.users.items():
-            if user.is_locked_out():
-                continue
-
-            for stored_embedding in user.face_encodings:
-                stored_array = np.array(stored_embedding)
-                similarity = np.dot(embedding, stored_array)
-
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = user
+        best_name, best_similarity = self.gallery.match(embedding)
+        best_match = self.users.get(best_name) if best_name else None
 
         if not best_match:
             self.audit_service.add_log(
@@ -315,7 +495,8 @@ class FacialRecognitionService:
 
         if best_similarity < threshold:
             best_match.increment_failed_attempts(config.LOCKOUT_DURATION)
-            self._save_users()
+            self.gallery.set_lockout(best_match.name, best_match.lockout_until)
+            self._save_login_state(best_match)
 
             self.audit_service.add_log(
                 event_type="authentication",
@@ -331,8 +512,9 @@ class FacialRecognitionService:
 
         if not requires_mfa:
             best_match.reset_failed_attempts()
+            self.gallery.set_lockout(best_match.name, None)
             best_match.update_last_access()
-            self._save_users()
+            self._save_login_state(best_match)
 
             self.audit_service.add_log(
                 event_type="authentication",
@@ -351,9 +533,12 @@ class FacialRecognitionService:
             return False, "Usuário não encontrado"
 
         if self.mfa_service.verify_code(username, otp_code):
+            # Secret configurado no app autenticador: o QR do cadastro não precisa mais ser exibido
+            self.mfa_service.revoke_qr_tokens(username)
             user.reset_failed_attempts()
+            self.gallery.set_lockout(username, None)
             user.update_last_access()
-            self._save_users()
+            self._save_login_state(user)
 
             self.audit_service.add_log(
                 event_type="mfa_verification",
@@ -366,7 +551,8 @@ class FacialRecognitionService:
             return True, "Acesso concedido"
         else:
             user.increment_failed_attempts(config.LOCKOUT_DURATION)
-            self._save_users()
+            self.gallery.set_lockout(username, user.lockout_until)
+            self._save_login_state(user)
 
             self.audit_service.add_log(
                 event_type="mfa_verification",
@@ -402,7 +588,9 @@ class FacialRecognitionService:
             return False, "Usuário não encontrado"
 
         del self.users[username]
-        self._save_users()
+        self.user_store.delete(username)
+        self.login_state.delete(username)
+        self.gallery.remove_user(username)
 
         self.mfa_service.remove_secret(username)
 
@@ -0,0 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+from utils.image_utils import perceptual_hash
+from utils.metrics import metrics
+
+class FrameCache:
+    """Cache LRU/TTL de (bbox, embedding) por frame decodificado.
+
+    A chave exata é o hash do conteúdo (formato + pixels); opcionalmente um dHash aceita frames
+    quase idênticos, só dentro da mesma sessão (um frame nunca embedado não pode herdar o embedding
+    de outro cliente). Só o embedding é reaproveitado: matching, lockout e auditoria rodam sempre."""
+
+    def __init__(self, max_entries=config.FRAME_CACHE_MAX_ENTRIES, ttl=config.FRAME_CACHE_TTL,
+                 perceptual=config.FRAME_CACHE_PERCEPTUAL,
+                 max_distance=config.FRAME_CACHE_PERCEPTUAL_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+
+        # chave exata -> (dHash, sessão, resultado, expiração)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+        metrics.register_stats('frame_cache', self.get_stats)
+
+    def keys(self, image, session_id=None):
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(str(image.shape).encode(), digest_size=16)
+        digest.update(image.data)
+
+        # Sem sessão não há busca aproximada: só o mesmo conteúdo reaproveita o embedding
+        phash = perceptual_hash(image) if self.perceptual and session_id is not None else None
+        return digest.digest(), phash, session_id
+
+    def get(self, keys):
+        exact_key, phash, session_id = keys
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(exact_key)
+            if entry is not None and entry[3] > now:
+                self._entries.move_to_end(exact_key)
+                self.exact_hits += 1
+                return entry[2]
+
+            if phash is not None:
+                for key, (other_phash, other_session, result, expires_at) in reversed(self._entries.items()):
+                    if (expires_at > now and other_session == session_id and other_phash is not None
+                            and bin(phash ^ other_phash).count('1') <= self.max_distance):
+                        self._entries.move_to_end(key)
+                        self.perceptual_hits += 1
+                        return result
+
+            self.misses += 1
+            return None
+
+    def put(self, keys, result):
+        exact_key, phash, session_id = keys
+
+        with self._lock:
+            self._entries[exact_key] = (phash, session_id, result, time.monotonic() + self.ttl)
+            self._entries.move_to_end(exact_key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.perceptual_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'perceptual_hits': self.perceptual_hits,
+                'misses': self.misses,
+                'hit_rate': (self.exact_hits + self.perceptual_hits) / lookups if lookups else 0.0
+            }
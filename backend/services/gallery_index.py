@@ -0,0 +1,164 @@
+import pickle
+import numpy as np
+
+import config
+
+class FlatIndex:
+    """Busca exata: todas as linhas da galeria são candidatas"""
+
+    kind = 'flat'
+
+    def add(self, rows, vectors):
+        pass
+
+    def remove(self, rows):
+        pass
+
+    def candidates(self, query):
+        return None
+
+    def needs_training(self, count):
+        return False
+
+    def save(self, path, encryption):
+        pass
+
+    def load(self, path, encryption):
+        return False
+
+class IVFIndex:
+    """Índice IVF (quantizador grosso por k-means) sobre as linhas da galeria"""
+
+    kind = 'ivf'
+
+    def __init__(self, nlist=config.IVF_NLIST, nprobe=config.IVF_NPROBE,
+                 min_train_size=config.IVF_MIN_TRAIN_SIZE,
+                 train_iterations=config.IVF_TRAIN_ITERATIONS,
+                 retrain_factor=config.IVF_RETRAIN_FACTOR):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_iterations = train_iterations
+        self.retrain_factor = retrain_factor
+
+        self.centroids = None
+        self.trained_size = 0
+        self.lists = []
+        self._list_arrays = []
+        self.assignments = {}
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _assign(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def add(self, rows, vectors):
+        if not self.is_trained or len(rows) == 0:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(rows), -1)
+        for row, list_id in zip(rows, self._assign(vectors)):
+            row, list_id = int(row), int(list_id)
+            self.lists[list_id].append(row)
+            self._list_arrays[list_id] = None
+            self.assignments[row] = list_id
+
+    def remove(self, rows):
+        for row in rows:
+            list_id = self.assignments.pop(row, None)
+            if list_id is not None:
+                self.lists[list_id].remove(row)
+                self._list_arrays[list_id] = None
+
+    def candidates(self, query):
+        if not self.is_trained:
+            return None
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        arrays = []
+        for list_id in probes:
+            array = self._list_arrays[list_id]
+            if array is None:
+                array = np.array(self.lists[list_id], dtype=np.int64)
+                self._list_arrays[list_id] = array
+            arrays.append(array)
+
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def needs_training(self, count):
+        if self.is_trained:
+            return count >= self.trained_size * self.retrain_factor
+        return count >= self.min_train_size
+
+    def fit(self, vectors, seed=0):
+        """k-means esférico (embeddings normalizados, similaridade por produto interno).
+        Só calcula os centróides: o índice em uso não é alterado"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        nlist = min(self.nlist, len(vectors))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+
+            empty = norms[:, 0] == 0
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        return centroids.astype(np.float32)
+
+    def reset(self, centroids, trained_size):
+        """Troca os centróides e esvazia as listas; as linhas devem ser re-adicionadas em seguida"""
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.trained_size = trained_size
+        self.lists = [[] for _ in range(len(self.centroids))]
+        self._list_arrays = [None] * len(self.centroids)
+        self.assignments = {}
+
+    def save(self, path, encryption):
+        if not self.is_trained:
+            return
+
+        data = {
+            'kind': self.kind,
+            'nlist': len(self.centroids),
+            'trained_size': self.trained_size,
+            'centroids': self.centroids
+        }
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(encryption.encrypt(pickle.dumps(data)))
+
+    def load(self, path, encryption):
+        if not path.exists():
+            return False
+
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.loads(encryption.decrypt(f.read()))
+        except Exception:
+            return False
+
+        if data.get('kind') != self.kind:
+            return False
+
+        self.reset(data['centroids'], data['trained_size'])
+        return True
+
+def create_gallery_index(kind=None):
+    kind = kind or config.GALLERY_INDEX_TYPE
+    if kind == 'ivf':
+        return IVFIndex()
+    if kind == 'flat':
+        return FlatIndex()
+    raise ValueError(f"Tipo de índice desconhecido: {kind}")
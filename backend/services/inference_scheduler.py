@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import config
+
+class InferenceBatcher:
+    """Agrupa requisições concorrentes em um único forward de detecção e um de embedding"""
+
+    def __init__(self, pipeline, max_batch_size=config.INFERENCE_BATCH_MAX_SIZE,
+                 wait_ms=config.INFERENCE_BATCH_WAIT_MS):
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.wait_seconds = wait_ms / 1000.0
+
+        self._queue = Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.batched_requests = 0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, frame):
+        """Retorna (bbox, embedding) da maior face do frame preparado pelo FacePipeline, ou (None, None)"""
+        self._ensure_started()
+
+        future = Future()
+        self._queue.put((frame, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.pipeline.process_batch([frame for frame, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batched_requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def get_stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.batched_requests,
+            'average_batch_size': self.batched_requests / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'wait_ms': self.wait_seconds * 1000.0
+        }
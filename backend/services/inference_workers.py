@@ -0,0 +1,142 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+from queue import Queue
+
+import cv2
+import numpy as np
+
+import config
+from utils.image_utils import resize_image
+from utils.metrics import Metrics, metrics
+
+# Estado de cada processo worker (modelos carregados uma única vez no initializer)
+_worker = {}
+
+def _init_worker(slot_names, num_threads):
+    from .face_pipeline import FacePipeline
+    from .facial_recognition_service import FaceDetectorDNN, FaceEmbedder
+
+    if num_threads is not None:
+        cv2.setNumThreads(num_threads)
+
+    _worker['pipeline'] = FacePipeline(FaceDetectorDNN(), FaceEmbedder())
+    _worker['slots'] = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+def _process_frame(slot_index, shape, roi):
+    slot = _worker['slots'][slot_index]
+    image = np.ndarray(shape, dtype=np.uint8, buffer=slot.buf)
+
+    # Os tempos por etapa medidos no worker voltam junto com o resultado
+    pipeline = _worker['pipeline']
+    pipeline.metrics = Metrics()
+    face_bbox, embedding = pipeline.run(image, roi)
+
+    if face_bbox is not None:
+        face_bbox = tuple(int(v) for v in face_bbox)
+    return face_bbox, embedding, pipeline.metrics.samples()
+
+def _warm_up_worker(_):
+    pipeline = _worker['pipeline']
+    pipeline.detector.warm_up(((300, 300), config.TRACKING_ROI_INPUT_SIZE))
+    pipeline.embedder.warm_up()
+
+class InferenceWorkerPool:
+    """Pool de processos para pré-processamento, detecção e embedding.
+
+    Os frames decodificados são copiados para slots de memória compartilhada pré-alocados;
+    só o índice do slot e o formato trafegam pelo pipe, e o embedding volta para o matcher."""
+
+    def __init__(self, num_workers=config.INFERENCE_WORKERS,
+                 max_frame_size=config.INFERENCE_WORKER_MAX_FRAME,
+                 worker_threads=config.INFERENCE_WORKER_THREADS,
+                 start_method=config.INFERENCE_WORKER_START_METHOD):
+        if start_method == 'fork' and threading.active_count() != 1:
+            raise RuntimeError(
+                f"Pool de inferência com 'fork' exige um processo sem outras threads "
+                f"({threading.active_count()} ativas); use 'forkserver' ou 'spawn'"
+            )
+
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_frame_size = max_frame_size
+
+        width, height = max_frame_size
+        slot_bytes = width * height * 3
+        self.slots = [
+            shared_memory.SharedMemory(create=True, size=slot_bytes)
+            for _ in range(self.num_workers * 2)
+        ]
+
+        self._free_slots = Queue()
+        for index in range(len(self.slots)):
+            self._free_slots.put(index)
+
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            # O servidor de fork pré-carrega só este módulo (OpenCV/numpy), não o módulo principal da API
+            context.set_forkserver_preload([__name__])
+        self.pool = context.Pool(
+            processes=self.num_workers,
+            initializer=_init_worker,
+            initargs=([slot.name for slot in self.slots], worker_threads)
+        )
+
+        atexit.register(self.close)
+
+    def submit(self, image, roi=None):
+        """Retorna (bbox, embedding) da maior face da imagem, processada em um worker"""
+        height, width = image.shape[:2]
+        max_width, max_height = self.max_frame_size
+
+        # Frames maiores que o slot são reduzidos; ROI e bbox são convertidos entre as escalas
+        scale = 1.0
+        if width > max_width or height > max_height:
+            image = resize_image(image, self.max_frame_size)
+            scale = width / image.shape[1]
+            if roi is not None:
+                roi = tuple(int(v / scale) for v in roi)
+
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+        index = self._free_slots.get()
+        try:
+            slot = self.slots[index]
+            np.ndarray(image.shape, dtype=np.uint8, buffer=slot.buf)[:] = image
+            face_bbox, embedding, samples = self.pool.apply(_process_frame, (index, image.shape, roi))
+        finally:
+            self._free_slots.put(index)
+
+        metrics.merge_samples(samples)
+        if face_bbox is not None and scale != 1.0:
+            face_bbox = tuple(int(round(v * scale)) for v in face_bbox)
+        return face_bbox, embedding
+
+    def warm_up(self):
+        # Uma tarefa por worker; o Pool não garante a distribuição, então é aproveitamento de melhor esforço
+        self.pool.map(_warm_up_worker, range(self.num_workers), chunksize=1)
+
+    def close(self):
+        if self.pool is None:
+            return
+
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+
+        for slot in self.slots:
+            slot.close()
+            try:
+                slot.unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self):
+        return {
+            'workers': self.num_workers,
+            'slots': len(self.slots),
+            'free_slots': self._free_slots.qsize()
+        }
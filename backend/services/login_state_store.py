@@ -0,0 +1,57 @@
+import sqlite3
+import threading
+
+import config
+
+class LoginStateStore:
+    """Estado volátil de login (tentativas, lockout, último acesso) separado dos templates biométricos"""
+
+    def __init__(self, db_path=config.LOGIN_STATE_DB):
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS login_state ('
+            ' name TEXT PRIMARY KEY,'
+            ' failed_attempts INTEGER NOT NULL DEFAULT 0,'
+            ' lockout_until REAL,'
+            ' last_access TEXT)'
+        )
+        self.conn.commit()
+
+    def load_all(self):
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT name, failed_attempts, lockout_until, last_access FROM login_state'
+            ).fetchall()
+
+        return {
+            name: {
+                'failed_attempts': failed_attempts,
+                'lockout_until': lockout_until,
+                'last_access': last_access
+            }
+            for name, failed_attempts, lockout_until, last_access in rows
+        }
+
+    def save(self, user):
+        with self._lock:
+            self.conn.execute(
+                'INSERT INTO login_state (name, failed_attempts, lockout_until, last_access)'
+                ' VALUES (?, ?, ?, ?)'
+                ' ON CONFLICT(name) DO UPDATE SET'
+                ' failed_attempts = excluded.failed_attempts,'
+                ' lockout_until = excluded.lockout_until,'
+                ' last_access = excluded.last_access',
+                (user.name, user.failed_attempts, user.lockout_until, user.last_access)
+            )
+            self.conn.commit()
+
+    def delete(self, name):
+        with self._lock:
+            self.conn.execute('DELETE FROM login_state WHERE name = ?', (name,))
+            self.conn.commit()
@@ -1,6 +1,9 @@
 import pyotp
 import qrcode
 import json
+import secrets
+import threading
+import time
 from io import BytesIO
 from base64 import b64encode
 import config
@@ -22,6 +25,8 @@ class MFAService:
         self.secrets_file = config.MFA_SECRETS_FILE
         self.encryption = EncryptionService()
         self.secrets = self._load_secrets()
+        self._qr_tokens = {}
+        self._qr_lock = threading.Lock()
         self._initialized = True
 
     def _load_secrets(self):
@@ -59,6 +64,7 @@ class MFAService:
         if username in self.secrets:
             del self.secrets[username]
             self._save_secrets()
+        self.revoke_qr_tokens(username)
 
     def generate_qr_code(self, username, secret, issuer="Sistema Reconhecimento Facial"):
         totp = pyotp.TOTP(secret)
@@ -76,6 +82,28 @@ class MFAService:
 
         return f"data:image/png;base64,{img_base64}"
 
+    def create_qr_token(self, username, ttl=config.MFA_QR_TOKEN_TTL):
+        # Token que libera a renderização do QR code após o cadastro. Vale até expirar ou até o primeiro
+        # MFA verificado do usuário: se a resposta com o QR se perder, o cliente pode pedir de novo
+        token = secrets.token_urlsafe(24)
+        with self._qr_lock:
+            now = time.time()
+            self._qr_tokens = {t: v for t, v in self._qr_tokens.items() if v[1] > now}
+            self._qr_tokens[token] = (username, now + ttl)
+        return token
+
+    def resolve_qr_token(self, token):
+        with self._qr_lock:
+            entry = self._qr_tokens.get(token)
+
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def revoke_qr_tokens(self, username):
+        with self._qr_lock:
+            self._qr_tokens = {t: v for t, v in self._qr_tokens.items() if v[0] != username}
+
     def verify_code(self, username, code):
         secret = self.get_secret(username)
         if not secret:
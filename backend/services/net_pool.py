@@ -0,0 +1,131 @@
+import threading
+from contextlib import contextmanager
+from queue import Queue, Empty
+
+import cv2
+
+import config
+
+# Nomes aceitos em config.DNN_BACKEND / config.DNN_TARGET (constantes cv2.dnn ausentes no build são ignoradas)
+DNN_BACKENDS = {
+    'default': 'DNN_BACKEND_DEFAULT',
+    'opencv': 'DNN_BACKEND_OPENCV',
+    'inference_engine': 'DNN_BACKEND_INFERENCE_ENGINE',
+    'halide': 'DNN_BACKEND_HALIDE',
+    'vkcom': 'DNN_BACKEND_VKCOM',
+    'cuda': 'DNN_BACKEND_CUDA',
+    'webnn': 'DNN_BACKEND_WEBNN',
+    'timvx': 'DNN_BACKEND_TIMVX',
+    'cann': 'DNN_BACKEND_CANN'
+}
+
+DNN_TARGETS = {
+    'cpu': 'DNN_TARGET_CPU',
+    'cpu_fp16': 'DNN_TARGET_CPU_FP16',
+    'opencl': 'DNN_TARGET_OPENCL',
+    'opencl_fp16': 'DNN_TARGET_OPENCL_FP16',
+    'cuda': 'DNN_TARGET_CUDA',
+    'cuda_fp16': 'DNN_TARGET_CUDA_FP16',
+    'vulkan': 'DNN_TARGET_VULKAN'
+}
+
+def configure_net(net, backend=None, target=None):
+    if backend is not None:
+        net.setPreferableBackend(getattr(cv2.dnn, DNN_BACKENDS[backend]))
+    if target is not None:
+        net.setPreferableTarget(getattr(cv2.dnn, DNN_TARGETS[target]))
+    return net
+
+def available_cpu_backends():
+    """Backends do cv2.dnn deste build que aceitam o alvo CPU"""
+    backends = []
+    for name, constant in DNN_BACKENDS.items():
+        if name == 'default' or not hasattr(cv2.dnn, constant):
+            continue
+        try:
+            targets = cv2.dnn.getAvailableTargets(getattr(cv2.dnn, constant))
+        except cv2.error:
+            continue
+        if cv2.dnn.DNN_TARGET_CPU in targets:
+            backends.append(name)
+    return backends
+
+def configure_opencv_threads(num_threads=config.OPENCV_NUM_THREADS):
+    # Threads intra-op do OpenCV; None mantém o padrão da biblioteca
+    if num_threads is not None:
+        cv2.setNumThreads(num_threads)
+    return cv2.getNumThreads()
+
+class NetPool:
+    """Pool limitado de réplicas de cv2.dnn.Net: setInput/forward não são seguros em uma rede compartilhada"""
+
+    def __init__(self, factory, size=config.DNN_POOL_SIZE, timeout=config.DNN_POOL_TIMEOUT):
+        self._factory = factory
+        self.size = max(1, size)
+        self.timeout = timeout
+
+        self._available = Queue(maxsize=self.size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+        # A primeira réplica é criada já na construção para validar o modelo
+        self._available.put(self._factory())
+        self._created = 1
+
+    def _try_create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+
+        try:
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def checkout(self):
+        try:
+            net = self._available.get_nowait()
+        except Empty:
+            net = self._try_create()
+            if net is None:
+                try:
+                    net = self._available.get(timeout=self.timeout)
+                except Empty:
+                    raise RuntimeError("Nenhuma instância de rede disponível")
+
+        try:
+            yield net
+        finally:
+            self._available.put(net)
+
+    def warm_up(self, forward):
+        """Cria todas as réplicas e executa forward(net) em cada uma (alocação do primeiro forward)"""
+        nets = []
+        try:
+            while len(nets) < self.size:
+                try:
+                    nets.append(self._available.get_nowait())
+                except Empty:
+                    net = self._try_create()
+                    if net is None:
+                        break
+                    nets.append(net)
+
+            for net in nets:
+                forward(net)
+        finally:
+            for net in nets:
+                self._available.put(net)
+
+        return len(nets)
+
+    def get_stats(self):
+        return {
+            'size': self.size,
+            'created': self._created,
+            'available': self._available.qsize()
+        }
@@ -0,0 +1,49 @@
+import config
+from utils.image_utils import measure_image_quality
+from utils.metrics import metrics
+
+REJECTION_MESSAGES = {
+    'too_dark': "Imagem muito escura",
+    'too_bright': "Imagem muito clara",
+    'low_contrast': "Imagem sem detalhes suficientes",
+    'blurry': "Imagem desfocada"
+}
+
+class QualityGate:
+    """Rejeita frames inutilizáveis (escuros, estourados, sem contraste ou borrados) antes de qualquer forward do cv2.dnn"""
+
+    def __init__(self, thumbnail_width=config.QUALITY_THUMBNAIL_WIDTH,
+                 min_brightness=config.QUALITY_MIN_BRIGHTNESS,
+                 max_brightness=config.QUALITY_MAX_BRIGHTNESS,
+                 min_contrast=config.QUALITY_MIN_CONTRAST,
+                 min_sharpness=config.QUALITY_MIN_SHARPNESS):
+        self.thumbnail_width = thumbnail_width
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.min_sharpness = min_sharpness
+
+    def _rejection_reason(self, quality):
+        if quality['brightness'] < self.min_brightness:
+            return 'too_dark'
+        if quality['brightness'] > self.max_brightness:
+            return 'too_bright'
+        if quality['contrast'] < self.min_contrast:
+            return 'low_contrast'
+        if quality['sharpness'] < self.min_sharpness:
+            return 'blurry'
+        return None
+
+    def check(self, image):
+        """Retorna (aprovado, motivo, mensagem); as rejeições são contadas por motivo"""
+        with metrics.timer('preprocess.quality'):
+            quality = measure_image_quality(image, self.thumbnail_width)
+
+        reason = self._rejection_reason(quality)
+        if reason is None:
+            metrics.increment('quality.passed')
+            return True, None, "OK"
+
+        metrics.increment(f'quality.rejected.{reason}')
+        return False, reason, REJECTION_MESSAGES[reason]
+
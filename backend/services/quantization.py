@@ -0,0 +1,67 @@
+import numpy as np
+
+class Float32Codec:
+    name = 'none'
+    dtype = np.float32
+    exact = True
+
+    def calibrate(self, vectors):
+        pass
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float32)
+
+    def decode(self, codes):
+        return np.asarray(codes, dtype=np.float32)
+
+    def score(self, codes, query):
+        return codes @ query
+
+class Float16Codec(Float32Codec):
+    name = 'float16'
+    dtype = np.float16
+    exact = False
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float16)
+
+    def score(self, codes, query):
+        return codes.astype(np.float32) @ query
+
+class Int8Codec(Float32Codec):
+    """Quantização int8 simétrica com escala por dimensão"""
+
+    name = 'int8'
+    dtype = np.int8
+    exact = False
+
+    def __init__(self, dimension, headroom=1.1):
+        self.headroom = headroom
+        self.scale = np.full(dimension, 1.0 / 127, dtype=np.float32)
+
+    def calibrate(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) == 0:
+            return
+
+        max_abs = np.abs(vectors).max(axis=0) * self.headroom
+        self.scale = np.where(max_abs > 0, max_abs / 127, 1.0 / 127).astype(np.float32)
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale
+
+    def score(self, codes, query):
+        return codes.astype(np.float32) @ (query * self.scale)
+
+def create_codec(name, dimension):
+    if name in (None, 'none', 'float32'):
+        return Float32Codec()
+    if name == 'float16':
+        return Float16Codec()
+    if name == 'int8':
+        return Int8Codec(dimension)
+    raise ValueError(f"Quantização desconhecida: {name}")
@@ -0,0 +1,108 @@
+import multiprocessing
+import threading
+import time
+
+import config
+
+class Readiness:
+    """Estado de carregamento do serviço de reconhecimento, consultado por /api/ready sem importar OpenCV"""
+
+    COMPONENTS = ('models', 'gallery', 'warm_up')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = {}
+        self.error = None
+        self.started_at = None
+
+    def start(self):
+        # Nova tentativa de carga: o erro da anterior deixa de valer
+        with self._lock:
+            self.error = None
+            if self.started_at is None:
+                self.started_at = time.time()
+
+    def mark(self, component):
+        with self._lock:
+            self._loaded[component] = time.time()
+
+    def fail(self, error):
+        with self._lock:
+            self.error = str(error)
+
+    def is_ready(self):
+        with self._lock:
+            return self.error is None and all(c in self._loaded for c in self.COMPONENTS)
+
+    def snapshot(self):
+        with self._lock:
+            components = {
+                component: {
+                    'loaded': component in self._loaded,
+                    'seconds': round(self._loaded[component] - self.started_at, 3)
+                    if component in self._loaded and self.started_at else None
+                }
+                for component in self.COMPONENTS
+            }
+            error = self.error
+            started = self.started_at is not None
+
+        if error:
+            status = 'failed'
+        elif all(c['loaded'] for c in components.values()):
+            status = 'ready'
+        else:
+            status = 'loading' if started else 'not_started'
+
+        return {'status': status, 'components': components, 'error': error}
+
+readiness = Readiness()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_facial_service():
+    """Cria (na primeira chamada) e aquece o FacialRecognitionService; chamadas concorrentes aguardam"""
+    global _service
+    if _service is not None:
+        return _service
+
+    with _service_lock:
+        if _service is None:
+            from .facial_recognition_service import FacialRecognitionService
+
+            readiness.start()
+            try:
+                service = FacialRecognitionService()
+                if config.MODEL_WARM_UP:
+                    service.warm_up()
+                readiness.mark('warm_up')
+            except Exception as e:
+                readiness.fail(e)
+                # A próxima tentativa constrói um serviço novo: descarta o singleton incompleto
+                # e encerra o que ele já tinha iniciado (workers, fila de tarefas)
+                failed = FacialRecognitionService._instance
+                FacialRecognitionService._instance = None
+                if failed is not None:
+                    try:
+                        failed.close()
+                    except Exception:
+                        pass
+                raise
+            _service = service
+
+    return _service
+
+def start_loading():
+    """Carrega os modelos e a galeria fora do caminho das requisições"""
+    # Workers de inferência (forkserver/spawn) importam o módulo principal: não carregar o serviço neles
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+
+    def load():
+        try:
+            get_facial_service()
+        except Exception:
+            pass  # exposto em /api/ready
+
+    threading.Thread(target=load, name='service-loader', daemon=True).start()
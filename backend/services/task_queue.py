@@ -0,0 +1,166 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+import config
+from utils.metrics import metrics
+
+class TaskQueue:
+    """Fila durável (SQLite) de tarefas em segundo plano, executadas por uma única thread.
+
+    Cada tarefa é gravada (payload criptografado) antes de `enqueue` retornar, então nada se perde
+    se o processo cair; tarefas pendentes são retomadas no próximo `start`. A ordem é mantida por
+    tipo: uma tarefa aguardando retentativa só segura as do mesmo tipo. Falhas são repetidas com
+    backoff exponencial e, após `max_attempts`, a tarefa fica com status 'failed' (exceto tipos
+    registrados com retry_forever, repetidos indefinidamente no intervalo máximo)."""
+
+    def __init__(self, encryption, db_path=config.TASK_QUEUE_DB,
+                 max_attempts=config.TASK_MAX_ATTEMPTS,
+                 retry_base_delay=config.TASK_RETRY_BASE_DELAY,
+                 retry_max_delay=config.TASK_RETRY_MAX_DELAY):
+        self.encryption = encryption
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+        self.handlers = {}
+        self.retry_forever = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' kind TEXT NOT NULL,'
+            ' payload BLOB NOT NULL,'
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' next_run REAL NOT NULL,'
+            ' last_error TEXT)'
+        )
+        self.conn.commit()
+
+        metrics.register_stats('task_queue', self.get_stats)
+
+    def register(self, kind, handler, retry_forever=False):
+        self.handlers[kind] = handler
+        if retry_forever:
+            self.retry_forever.add(kind)
+
+    def start(self):
+        if self._thread is None:
+            # Tarefas desses tipos abandonadas por versões anteriores voltam para a fila
+            with self._lock:
+                for kind in self.retry_forever:
+                    self.conn.execute(
+                        "UPDATE tasks SET status = 'pending', next_run = ? WHERE status = 'failed' AND kind = ?",
+                        (time.time(), kind)
+                    )
+                self.conn.commit()
+
+            self._thread = threading.Thread(target=self._run, name='task-queue', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+
+        data = self.encryption.encrypt(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            cursor = self.conn.execute(
+                'INSERT INTO tasks (kind, payload, next_run) VALUES (?, ?, ?)',
+                (kind, data, time.time())
+            )
+            self.conn.commit()
+
+        metrics.increment('tasks.enqueued')
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def _next_task(self):
+        # A mais antiga de cada tipo (ordem preservada por tipo); entre elas, a que vence primeiro.
+        # Uma tarefa em backoff não segura as de outros tipos
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, kind, payload, attempts, next_run FROM tasks WHERE id IN"
+                " (SELECT MIN(id) FROM tasks WHERE status = 'pending' GROUP BY kind)"
+                " ORDER BY next_run, id LIMIT 1"
+            ).fetchone()
+
+    def close(self, timeout=5.0):
+        """Para a thread depois da tarefa em andamento; as pendentes continuam gravadas para o próximo start"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return
+        self.conn.close()
+
+    def _run(self):
+        while not self._closed:
+            task = self._next_task()
+            if task is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            task_id, kind, data, attempts, next_run = task
+            delay = next_run - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self.handlers[kind](pickle.loads(self.encryption.decrypt(data)))
+            except Exception as e:
+                self._fail(task_id, attempts + 1, e)
+                continue
+
+            with self._lock:
+                self.conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+                self.conn.commit()
+            metrics.increment('tasks.completed')
+
+    def _fail(self, task_id, attempts, error):
+        metrics.increment('tasks.retries')
+
+        with self._lock:
+            kind = self.conn.execute('SELECT kind FROM tasks WHERE id = ?', (task_id,)).fetchone()[0]
+            if attempts >= self.max_attempts and kind not in self.retry_forever:
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, str(error), task_id)
+                )
+                metrics.increment('tasks.failed')
+            else:
+                delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+                self.conn.execute(
+                    'UPDATE tasks SET attempts = ?, next_run = ?, last_error = ? WHERE id = ?',
+                    (attempts, time.time() + delay, str(error), task_id)
+                )
+            self.conn.commit()
+
+    def get_stats(self):
+        with self._lock:
+            rows = self.conn.execute('SELECT status, kind, COUNT(*) FROM tasks GROUP BY status, kind').fetchall()
+            retrying = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = 'pending' AND attempts > 0"
+            ).fetchone()[0]
+
+        failed_by_kind = {kind: count for status, kind, count in rows if status == 'failed'}
+        return {
+            'pending': sum(count for status, _, count in rows if status == 'pending'),
+            'retrying': retrying,
+            'failed': sum(failed_by_kind.values()),
+            'failed_by_kind': failed_by_kind
+        }
@@ -0,0 +1,211 @@
+import os
+import pickle
+import struct
+import threading
+
+import config
+
+class UserStore:
+    """Armazenamento log-structured: cada alteração de usuário é um registro criptografado anexado ao segmento ativo"""
+
+    _HEADER = struct.Struct('>I')
+    _TOKEN_CHARS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_='
+
+    def __init__(self, encryption, directory=config.USER_STORE_DIR,
+                 segment_max_bytes=config.USER_STORE_SEGMENT_MAX_BYTES,
+                 compaction_min_bytes=config.USER_STORE_COMPACTION_MIN_BYTES,
+                 compaction_dead_ratio=config.USER_STORE_COMPACTION_DEAD_RATIO,
+                 fsync=config.USER_STORE_FSYNC):
+        self.encryption = encryption
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compaction_min_bytes = compaction_min_bytes
+        self.compaction_dead_ratio = compaction_dead_ratio
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        self.records = {}
+        self._record_sizes = {}
+        self._live_bytes = 0
+        self._total_bytes = 0
+        self._active_id = 0
+        self._active_file = None
+
+    def _segment_path(self, segment_id):
+        return self.directory / f"segment-{segment_id:06d}.log"
+
+    def _segment_ids(self):
+        ids = []
+        for path in self.directory.glob('segment-*.log'):
+            try:
+                ids.append(int(path.stem.split('-')[1]))
+            except ValueError:
+                continue
+        return sorted(ids)
+
+    def _encode(self, record):
+        token = self.encryption.encrypt(pickle.dumps(record))
+        return self._HEADER.pack(len(token)) + token
+
+    def _apply(self, record, size):
+        op = record['op']
+        if op == 'snapshot':
+            self.records = {}
+            self._record_sizes = {}
+            self._live_bytes = 0
+        elif op == 'put':
+            self.records[record['name']] = record['data']
+            self._live_bytes += size - self._record_sizes.get(record['name'], 0)
+            self._record_sizes[record['name']] = size
+        elif op == 'delete':
+            self.records.pop(record['name'], None)
+            self._live_bytes -= self._record_sizes.pop(record['name'], 0)
+
+    def _replay_segment(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset + self._HEADER.size <= len(data):
+            (length,) = self._HEADER.unpack_from(data, offset)
+            end = offset + self._HEADER.size + length
+            if end > len(data):
+                # Escrita interrompida deixa só o prefixo de um token Fernet (base64); bytes de
+                # outros cabeçalhos depois dele indicam um tamanho corrompido no meio do segmento
+                if data[offset + self._HEADER.size:].translate(None, self._TOKEN_CHARS):
+                    raise ValueError(f"Tamanho de registro corrompido em {path.name} (offset {offset})")
+                break
+
+            # Registro completo que não autentica/decodifica: corrupção, não queda durante escrita.
+            # Nada é truncado: os registros seguintes continuam no arquivo para recuperação
+            try:
+                record = pickle.loads(self.encryption.decrypt(data[offset + self._HEADER.size:end]))
+            except Exception as e:
+                raise ValueError(f"Registro corrompido em {path.name} (offset {offset})") from e
+
+            self._apply(record, end - offset)
+            offset = end
+
+        # Só o registro incompleto no final (queda durante escrita) é descartado
+        if offset < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+
+        return offset
+
+    def load(self, legacy_file=None):
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            segment_ids = self._segment_ids()
+
+            if not segment_ids and legacy_file is not None and legacy_file.exists():
+                try:
+                    self._migrate_legacy(legacy_file)
+                except Exception:
+                    pass
+                segment_ids = self._segment_ids()
+
+            self.records = {}
+            self._record_sizes = {}
+            self._live_bytes = 0
+            self._total_bytes = 0
+            for segment_id in segment_ids:
+                self._total_bytes += self._replay_segment(self._segment_path(segment_id))
+
+            self._active_id = segment_ids[-1] if segment_ids else 1
+            self._open_active()
+            self._maybe_compact()
+
+            return dict(self.records)
+
+    def _migrate_legacy(self, legacy_file):
+        with open(legacy_file, 'rb') as f:
+            data = pickle.loads(self.encryption.decrypt(f.read()))
+
+        records = [{'op': 'put', 'name': name, 'data': user_data} for name, user_data in data.items()]
+        self._write_snapshot(1, records)
+        legacy_file.rename(legacy_file.with_name(legacy_file.name + '.migrated'))
+
+    def _write_snapshot(self, segment_id, records):
+        path = self._segment_path(segment_id)
+        tmp_path = path.with_suffix('.tmp')
+
+        sizes = {}
+        with open(tmp_path, 'wb') as f:
+            f.write(self._encode({'op': 'snapshot'}))
+            for record in records:
+                encoded = self._encode(record)
+                f.write(encoded)
+                sizes[record['name']] = len(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+        return sizes
+
+    def close(self):
+        with self._lock:
+            if self._active_file:
+                self._active_file.close()
+                self._active_file = None
+
+    def _open_active(self):
+        if self._active_file:
+            self._active_file.close()
+        self._active_file = open(self._segment_path(self._active_id), 'ab')
+
+    def _append(self, record):
+        encoded = self._encode(record)
+
+        if self._active_file.tell() > 0 and self._active_file.tell() + len(encoded) > self.segment_max_bytes:
+            self._active_id += 1
+            self._open_active()
+
+        self._active_file.write(encoded)
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+
+        self._total_bytes += len(encoded)
+        self._apply(record, len(encoded))
+        self._maybe_compact()
+
+    def put(self, name, data):
+        with self._lock:
+            self._append({'op': 'put', 'name': name, 'data': data})
+
+    def delete(self, name):
+        with self._lock:
+            if name in self.records:
+                self._append({'op': 'delete', 'name': name})
+
+    def _maybe_compact(self):
+        if self._total_bytes < self.compaction_min_bytes:
+            return
+
+        if (self._total_bytes - self._live_bytes) / self._total_bytes >= self.compaction_dead_ratio:
+            self._compact()
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        # O snapshot recebe id maior que todos os segmentos: no replay ele descarta o estado anterior,
+        # então uma queda antes de remover os segmentos antigos não ressuscita usuários removidos
+        old_ids = self._segment_ids()
+        snapshot_id = (old_ids[-1] if old_ids else 0) + 1
+
+        records = [{'op': 'put', 'name': name, 'data': data} for name, data in self.records.items()]
+        sizes = self._write_snapshot(snapshot_id, records)
+
+        self._active_file.close()
+        self._active_file = None
+        for segment_id in old_ids:
+            self._segment_path(segment_id).unlink(missing_ok=True)
+
+        self._active_id = snapshot_id
+        self._total_bytes = self._segment_path(snapshot_id).stat().st_size
+        self._record_sizes = sizes
+        self._live_bytes = sum(sizes.values())
+        self._open_active()
@@ -0,0 +1,240 @@
+"""
+Micro-benchmark de inferência: preprocess_image, FaceDetectorDNN e FaceEmbedder.
+
+Varre cv2.setNumThreads, backends CPU disponíveis do cv2.dnn, resoluções e tamanhos de lote,
+e gera JSON com latência p50/p95/p99 e vazão (imagens/s) por combinação. Usa os modelos
+configurados em config.py e imagens sintéticas ou as de --images.
+
+Com --images também compara os embeddings dos modos de pré-processamento 'roi' e 'full':
+a similaridade entre os dois é o score que um template cadastrado em 'full' obtém de uma
+nova captura da mesma imagem em 'roi' (deslocamento a considerar antes de trocar o modo).
+
+Uso: python tools/benchmark_inference.py [--threads 1,2,4] [--batch-sizes 1,4,8] [--output bench.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from services.face_pipeline import FacePipeline
+from services.facial_recognition_service import FaceDetectorDNN, FaceEmbedder
+from services.net_pool import available_cpu_backends
+from utils.image_utils import preprocess_image, resize_image
+
+DEFAULT_RESOLUTIONS = '640x480,1280x720,1920x1080'
+DEFAULT_DETECTOR_INPUTS = '300x300,160x160'
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in size.split('x')) for size in text.split(',') if size]
+
+def parse_ints(text):
+    return [int(v) for v in text.split(',') if v]
+
+def synthetic_image(width, height, seed=0):
+    # Blocos de cor suavizados: textura parecida com uma cena real para o CLAHE e o filtro bilateral
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(30, 220, size=(max(1, height // 40), max(1, width // 40), 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_LINEAR)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+def load_images(directory, size):
+    images = []
+    for path in sorted(Path(directory).iterdir()):
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append(resize_image(image, size))
+    return images
+
+def measure(fn, items_per_call, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    samples = np.array(samples) * 1000.0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'iterations': iterations,
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(samples.max()),
+        'throughput_per_s': float(items_per_call * iterations / (samples.sum() / 1000.0))
+    }
+
+def bench_preprocess(images_by_resolution, args):
+    results = []
+    for (width, height), images in images_by_resolution.items():
+        image = images[0]
+        result = measure(lambda: preprocess_image(image), 1, args.iterations, args.warmup)
+        results.append({'benchmark': 'preprocess_image', 'resolution': [width, height], **result})
+    return results
+
+def bench_detector(backend, images_by_resolution, args):
+    detector = FaceDetectorDNN(backend=backend, target='cpu', pool_size=1)
+    source = next(iter(images_by_resolution.values()))[0]
+
+    results = []
+    for input_size in parse_sizes(args.detector_inputs):
+        for batch_size in args.batch_sizes:
+            batch = [source] * batch_size
+            result = measure(lambda: detector.detect_batch(batch, config.MIN_FACE_CONFIDENCE, input_size),
+                             batch_size, args.iterations, args.warmup)
+            results.append({
+                'benchmark': 'detector',
+                'input_size': list(input_size),
+                'batch_size': batch_size,
+                **result
+            })
+    return results
+
+def bench_embedder(backend, args):
+    embedder = FaceEmbedder(backend=backend, target='cpu', pool_size=1)
+    face = synthetic_image(160, 160, seed=1)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        batch = [face] * batch_size
+        result = measure(lambda: embedder.extract_batch(batch), batch_size, args.iterations, args.warmup)
+        results.append({'benchmark': 'embedder', 'batch_size': batch_size, **result})
+    return results
+
+def bench_pipeline(backend, images_by_resolution, args):
+    # Só faz sentido com faces reais (--images): sem face, o embedder não roda
+    pipeline = FacePipeline(FaceDetectorDNN(backend=backend, target='cpu', pool_size=1),
+                            FaceEmbedder(backend=backend, target='cpu', pool_size=1))
+
+    results = []
+    for (width, height), images in images_by_resolution.items():
+        for mode in ('roi', 'full'):
+            pipeline.mode = mode
+            position = [0]
+
+            def run():
+                pipeline.run(images[position[0] % len(images)])
+                position[0] += 1
+
+            result = measure(run, 1, args.iterations, args.warmup)
+            results.append({'benchmark': 'pipeline', 'mode': mode, 'resolution': [width, height], **result})
+    return results
+
+def measure_mode_shift(backend, images_by_resolution):
+    """Similaridade entre os embeddings 'full' e 'roi' da mesma imagem, por resolução"""
+    pipeline = FacePipeline(FaceDetectorDNN(backend=backend, target='cpu', pool_size=1),
+                            FaceEmbedder(backend=backend, target='cpu', pool_size=1))
+
+    results = []
+    for (width, height), images in images_by_resolution.items():
+        similarities = []
+        for image in images:
+            embeddings = {}
+            for mode in ('full', 'roi'):
+                pipeline.mode = mode
+                embeddings[mode] = pipeline.run(image)[1]
+            if embeddings['full'] is not None and embeddings['roi'] is not None:
+                similarities.append(float(np.dot(embeddings['full'], embeddings['roi'])))
+
+        if similarities:
+            results.append({
+                'resolution': [width, height],
+                'faces': len(similarities),
+                'similarity_mean': float(np.mean(similarities)),
+                'similarity_p5': float(np.percentile(similarities, 5)),
+                'similarity_min': float(np.min(similarities))
+            })
+    return results
+
+def environment():
+    return {
+        'opencv_version': cv2.__version__,
+        'numpy_version': np.__version__,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'default_opencv_threads': cv2.getNumThreads(),
+        'available_cpu_backends': available_cpu_backends()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=str, default=None,
+                        help='valores de cv2.setNumThreads separados por vírgula (padrão: 1 e número de CPUs)')
+    parser.add_argument('--backends', type=str, default=None,
+                        help='backends do cv2.dnn (padrão: todos os disponíveis para CPU)')
+    parser.add_argument('--resolutions', type=str, default=DEFAULT_RESOLUTIONS, help='resoluções dos frames, ex.: 640x480')
+    parser.add_argument('--detector-inputs', type=str, default=DEFAULT_DETECTOR_INPUTS,
+                        help='tamanhos de entrada do SSD (frame inteiro e ROI de rastreamento)')
+    parser.add_argument('--batch-sizes', type=parse_ints, default=[1, 2, 4, 8], help='tamanhos de lote, ex.: 1,4,8')
+    parser.add_argument('--iterations', type=int, default=50, help='medições por combinação')
+    parser.add_argument('--warmup', type=int, default=5, help='execuções descartadas antes de medir')
+    parser.add_argument('--images', type=str, default=None,
+                        help='diretório com imagens de faces (habilita o benchmark do pipeline completo)')
+    parser.add_argument('--output', type=str, default=None, help='arquivo JSON de saída')
+    args = parser.parse_args()
+
+    if not config.FACE_DETECTION_MODEL.exists() or not config.FACENET_MODEL.exists():
+        print(f"Modelos não encontrados em {config.MODELS_DIR}", file=sys.stderr)
+        return 1
+
+    threads = parse_ints(args.threads) if args.threads else sorted({1, os.cpu_count() or 1})
+    backends = args.backends.split(',') if args.backends else available_cpu_backends()
+
+    # Antes da varredura, para registrar o número de threads padrão do OpenCV
+    env = environment()
+
+    images_by_resolution = {}
+    for size in parse_sizes(args.resolutions):
+        images = load_images(args.images, size) if args.images else []
+        images_by_resolution[size] = images or [synthetic_image(*size)]
+
+    results = []
+    for num_threads in threads:
+        cv2.setNumThreads(num_threads)
+        common = {'threads': num_threads}
+
+        results += [{**common, **r} for r in bench_preprocess(images_by_resolution, args)]
+        for backend in backends:
+            entries = bench_detector(backend, images_by_resolution, args) + bench_embedder(backend, args)
+            if args.images:
+                entries += bench_pipeline(backend, images_by_resolution, args)
+            results += [{**common, 'backend': backend, **r} for r in entries]
+
+    report = {
+        'environment': env,
+        'parameters': {
+            'threads': threads,
+            'backends': backends,
+            'resolutions': [list(size) for size in images_by_resolution],
+            'batch_sizes': args.batch_sizes,
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'images': args.images
+        },
+        'results': results
+    }
+    if args.images:
+        report['roi_vs_full_similarity'] = measure_mode_shift(backends[0], images_by_resolution)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Relatório de quantização da galeria: memória economizada, efeito nos scores
+e nas decisões de acesso nos thresholds configurados por nível, e latência de
+FaceGallery.match com os embeddings num EmbeddingStore criptografado temporário
+(o re-ranking dos codecs compactos descriptografa chunks desse arquivo).
+
+Uso: python tools/quantization_report.py [--synthetic N] [--noise 0.35] [--output relatorio.json]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from services.embedding_store import EmbeddingStore
+from services.encryption_service import EncryptionService
+from services.face_gallery import FaceGallery
+from services.quantization import create_codec
+from services.user_store import UserStore
+
+# Tamanho aproximado de um template como lista Python de floats (lista + objetos float)
+PYTHON_LIST_BYTES_PER_TEMPLATE = sys.getsizeof([0.0] * config.EMBEDDING_DIMENSION) + 24 * config.EMBEDDING_DIMENSION
+
+def load_thresholds():
+    thresholds = {1: 0.70, 2: 0.80, 3: 0.85}
+    if config.CONFIG_JSON_FILE.exists():
+        with open(config.CONFIG_JSON_FILE, 'r') as f:
+            data = json.load(f)
+        for level in thresholds:
+            thresholds[level] = data.get(f'nivel_{level}_threshold', thresholds[level])
+    return thresholds
+
+def load_gallery():
+    encryption = EncryptionService()
+    records = UserStore(encryption).load()
+    rows = sorted(row for record in records.values() for row in record.get('template_rows', []))
+    if not rows:
+        return np.zeros((0, config.EMBEDDING_DIMENSION), dtype=np.float32)
+    return EmbeddingStore(encryption).read_rows(rows)
+
+def synthetic_gallery(count, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, config.EMBEDDING_DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(gallery, noise, seed=1):
+    # Nova captura do mesmo usuário: template com ruído, renormalizado
+    rng = np.random.default_rng(seed)
+    queries = gallery + noise * rng.normal(size=gallery.shape).astype(np.float32) / np.sqrt(gallery.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def evaluate_codec(name, gallery, queries, thresholds, rerank_candidates):
+    codec = create_codec(name, gallery.shape[1])
+    codec.calibrate(gallery)
+    codes = codec.encode(gallery)
+
+    exact = queries @ gallery.T
+    coarse = np.stack([codec.score(codes, query) for query in queries])
+
+    exact_best = np.argmax(exact, axis=1)
+    coarse_best = np.argmax(coarse, axis=1)
+
+    # Re-ranking: melhores candidatos da forma compacta, score final exato em float32
+    k = min(rerank_candidates, gallery.shape[0])
+    top = np.argpartition(-coarse, k - 1, axis=1)[:, :k]
+    reranked_best = top[np.arange(len(queries)), np.argmax(np.take_along_axis(exact, top, axis=1), axis=1)]
+
+    self_scores = exact[np.arange(len(queries)), exact_best]
+    coarse_self_scores = coarse[np.arange(len(queries)), exact_best]
+    errors = np.abs(coarse - exact)
+
+    decisions = {}
+    for level, threshold in thresholds.items():
+        exact_granted = self_scores >= threshold
+        coarse_granted = coarse_self_scores >= threshold
+        decisions[f'nivel_{level}'] = {
+            'threshold': threshold,
+            'granted_exact': int(exact_granted.sum()),
+            'granted_coarse_only': int(coarse_granted.sum()),
+            'flipped_coarse_only': int((exact_granted != coarse_granted).sum()),
+            'flipped_with_rerank': int((reranked_best != exact_best).sum())
+        }
+
+    return {
+        'codec': name,
+        'bytes_per_template': int(codes.itemsize * gallery.shape[1]),
+        'gallery_bytes': int(codes.nbytes),
+        'score_abs_error_mean': float(errors.mean()),
+        'score_abs_error_max': float(errors.max()),
+        'top1_agreement_coarse_only': float((coarse_best == exact_best).mean()),
+        'top1_agreement_with_rerank': float((reranked_best == exact_best).mean()),
+        'decisions': decisions
+    }
+
+def measure_match_latency(name, gallery, queries, encryption, chunk_rows):
+    """Latência (ms) de FaceGallery.match com índice exato e o store criptografado em disco"""
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / 'embeddings.f32'
+        EmbeddingStore(encryption, path=path, chunk_rows=chunk_rows).write_rows(range(len(gallery)), gallery)
+
+        # Store reaberto: o cache de chunks começa vazio, como após reiniciar o serviço
+        store = EmbeddingStore(encryption, path=path, chunk_rows=chunk_rows)
+        face_gallery = FaceGallery(store=store, quantization=name)
+        face_gallery.load([(f'usuario_{row}', [row], None) for row in range(len(gallery))])
+
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            face_gallery.match(query)
+            timings.append((time.perf_counter() - start) * 1000.0)
+
+    timings = np.array(timings)
+    return {
+        'mean': float(timings.mean()),
+        'p50': float(np.percentile(timings, 50)),
+        'p95': float(np.percentile(timings, 95))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='usar N embeddings sintéticos em vez da galeria cadastrada')
+    parser.add_argument('--noise', type=float, default=0.35, help='ruído das consultas simuladas')
+    parser.add_argument('--queries', type=int, default=500, help='número máximo de consultas')
+    parser.add_argument('--latency-queries', type=int, default=200,
+                        help='consultas usadas na medição de latência do match (0 = não medir)')
+    parser.add_argument('--chunk-rows', type=int, default=config.EMBEDDING_CHUNK_ROWS,
+                        help='linhas por chunk do store criptografado na medição de latência')
+    parser.add_argument('--output', type=str, default=None, help='arquivo JSON de saída')
+    args = parser.parse_args()
+
+    gallery = synthetic_gallery(args.synthetic) if args.synthetic else load_gallery()
+    if len(gallery) == 0:
+        print("Galeria vazia: use --synthetic N", file=sys.stderr)
+        return 1
+
+    queries = make_queries(gallery[:args.queries], args.noise)
+    thresholds = load_thresholds()
+
+    results = [
+        evaluate_codec(name, gallery, queries, thresholds, config.GALLERY_RERANK_CANDIDATES)
+        for name in ('none', 'float16', 'int8')
+    ]
+
+    baseline = PYTHON_LIST_BYTES_PER_TEMPLATE * len(gallery)
+    for result in results:
+        result['memory_saved_vs_float32'] = 1.0 - result['gallery_bytes'] / results[0]['gallery_bytes']
+        result['memory_saved_vs_python_lists'] = 1.0 - result['gallery_bytes'] / baseline
+
+    if args.latency_queries:
+        # Consultas espalhadas pela galeria: candidatos em chunks distintos, como em produção
+        sample = np.random.default_rng(2).choice(len(gallery), min(args.latency_queries, len(gallery)), replace=False)
+        latency_queries = make_queries(gallery[sample], args.noise)
+        encryption = EncryptionService()
+        for result in results:
+            result['match_latency_ms'] = measure_match_latency(
+                result['codec'], gallery, latency_queries, encryption, args.chunk_rows
+            )
+
+    report = {
+        'templates': int(len(gallery)),
+        'queries': int(len(queries)),
+        'synthetic': bool(args.synthetic),
+        'python_lists_bytes': int(baseline),
+        'rerank_candidates': config.GALLERY_RERANK_CANDIDATES,
+        'embedding_chunk_rows': args.chunk_rows,
+        'embedding_cache_chunks': config.EMBEDDING_CACHE_CHUNKS,
+        'configured_quantization': config.GALLERY_QUANTIZATION,
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
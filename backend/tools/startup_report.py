@@ -0,0 +1,83 @@
+"""
+Custo de carga da galeria em função do número de templates: tempo de FaceGallery.load a partir de
+um EmbeddingStore criptografado temporário e memória alocada (pico e residente após a carga).
+
+A carga descriptografa todos os chunks e mantém a matriz da galeria residente (o match pontua todas
+as linhas candidatas), então tempo e memória crescem com o número de templates; o relatório mostra
+o custo por template para cada codec.
+
+Uso: python tools/startup_report.py [--sizes 1000,10000,100000] [--output relatorio.json]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from services.embedding_store import EmbeddingStore
+from services.encryption_service import EncryptionService
+from services.face_gallery import FaceGallery
+
+def synthetic_gallery(count, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, config.EMBEDDING_DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def measure_load(count, quantization, encryption, chunk_rows):
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / 'embeddings.f32'
+        EmbeddingStore(encryption, path=path, chunk_rows=chunk_rows).write_rows(range(count), synthetic_gallery(count))
+        users = [(f'usuario_{row}', [row], None) for row in range(count)]
+
+        # Store reaberto (cache vazio), como no início do serviço
+        tracemalloc.start()
+        start = time.perf_counter()
+        gallery = FaceGallery(store=EmbeddingStore(encryption, path=path, chunk_rows=chunk_rows),
+                              quantization=quantization)
+        gallery.load(users)
+        seconds = time.perf_counter() - start
+        resident, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'templates': count,
+        'codec': quantization,
+        'load_seconds': seconds,
+        'load_us_per_template': seconds / count * 1e6,
+        'gallery_bytes': int(gallery.memory_bytes),
+        'allocated_after_load_bytes': int(resident),
+        'allocated_peak_bytes': int(peak)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=str, default='1000,10000,100000', help='números de templates, ex.: 1000,10000')
+    parser.add_argument('--codecs', type=str, default='none,int8', help='quantizações da galeria')
+    parser.add_argument('--chunk-rows', type=int, default=config.EMBEDDING_CHUNK_ROWS,
+                        help='linhas por chunk do store criptografado')
+    parser.add_argument('--output', type=str, default=None, help='arquivo JSON de saída')
+    args = parser.parse_args()
+
+    encryption = EncryptionService()
+    results = [
+        measure_load(int(size), codec, encryption, args.chunk_rows)
+        for codec in args.codecs.split(',')
+        for size in args.sizes.split(',')
+    ]
+
+    report = {'embedding_chunk_rows': args.chunk_rows, 'results': results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
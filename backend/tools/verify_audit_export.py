@@ -0,0 +1,75 @@
+"""
+Verifica uma exportação NDJSON da auditoria (GET /api/audit/export) de forma incremental.
+
+Lê uma entrada por vez (arquivo ou stdin, memória constante), recalcula o hash de cada uma e
+confere o encadeamento prev_hash -> hash. Exportações filtradas não são contíguas: nesse caso
+só os hashes das entradas são conferidos e as quebras de sequência são contadas como lacunas.
+
+Para continuar a verificação de uma exportação anterior (parâmetro start), passe o último hash
+já verificado em --prev-hash.
+
+Uso: curl -s 'http://localhost:5000/api/audit/export' | python tools/verify_audit_export.py [--prev-hash HASH]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.audit_service import GENESIS_HASH, calculate_hash
+
+def verify(lines, prev_hash=None, contiguous=True):
+    """Retorna o resumo da verificação; para na primeira entrada inválida"""
+    summary = {'verified_entries': 0, 'gaps': 0, 'last_hash': prev_hash, 'valid': True, 'error': None}
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            log = json.loads(line)
+        except json.JSONDecodeError:
+            summary.update(valid=False, error=f"Linha {number} não é JSON válido")
+            break
+
+        if calculate_hash(log, log.get('prev_hash', '')) != log.get('hash'):
+            summary.update(valid=False, error=f"Hash inválido na linha {number}")
+            break
+
+        if prev_hash is not None and log['prev_hash'] != prev_hash:
+            if contiguous:
+                summary.update(valid=False, error=f"Cadeia quebrada na linha {number}")
+                break
+            summary['gaps'] += 1
+
+        prev_hash = log['hash']
+        summary['verified_entries'] += 1
+        summary['last_hash'] = prev_hash
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', nargs='?', default=None, help='arquivo NDJSON (padrão: stdin)')
+    parser.add_argument('--prev-hash', type=str, default=None,
+                        help='hash da última entrada já verificada (padrão: gênese da cadeia)')
+    parser.add_argument('--filtered', action='store_true',
+                        help='exportação filtrada: aceita lacunas no encadeamento')
+    args = parser.parse_args()
+
+    prev_hash = args.prev_hash
+    if prev_hash is None and not args.filtered:
+        prev_hash = GENESIS_HASH
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            summary = verify(f, prev_hash, contiguous=not args.filtered)
+    else:
+        summary = verify(sys.stdin, prev_hash, contiguous=not args.filtered)
+
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['valid'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,22 @@
 """
 Utils package
+
+Importações sob demanda: image_utils depende de OpenCV, validators e metrics não.
 """
-from .image_utils import decode_base64_image, encode_image_to_base64, validate_image
-from .validators import validate_security_level, validate_username
-
-__all__ = [
-    'decode_base64_image',
-    'encode_image_to_base64',
-    'validate_image',
-    'validate_security_level',
-    'validate_username'
-]
+import importlib
+
+_EXPORTS = {
+    'decode_base64_image': '.image_utils',
+    'encode_image_to_base64': '.image_utils',
+    'validate_image': '.image_utils',
+    'validate_security_level': '.validators',
+    'validate_username': '.validators'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
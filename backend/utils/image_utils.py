@@ -1,18 +1,76 @@
 import base64
+import struct
 import cv2
 import numpy as np
 from typing import Tuple, Optional
 
-def decode_base64_image(base64_string):
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+def read_image_size(image_bytes):
+    """Lê (largura, altura) do cabeçalho JPEG/PNG sem decodificar a imagem"""
+    data = memoryview(image_bytes)
+
+    if bytes(data[:8]) == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+
+    if bytes(data[:2]) != b'\xff\xd8':
+        return None
+
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+
+        (length,) = struct.unpack('>H', data[offset + 2:offset + 4])
+        # Marcadores SOF0..SOF15, exceto DHT (C4), JPG (C8) e DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+
+    return None
+
+def select_decode_flag(image_size, min_size=(640, 480)):
+    # Maior redução (1/8, 1/4, 1/2) que ainda mantém a imagem acima do tamanho mínimo
+    if image_size is None:
+        return cv2.IMREAD_COLOR
+
+    width, height = image_size
+    min_width, min_height = min_size
+    for factor, flag in _REDUCED_FLAGS:
+        if width // factor >= min_width and height // factor >= min_height:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def decode_image_bytes(image_bytes, min_size=(640, 480)):
+    """Decodifica JPEG/PNG em BGR, usando IMREAD_REDUCED_* quando a fonte é bem maior que o necessário"""
+    try:
+        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+        flag = select_decode_flag(read_image_size(image_bytes), min_size)
+        return cv2.imdecode(image_array, flag)
+    except Exception:
+        return None
+
+def decode_base64_image(base64_string, min_size=(640, 480)):
     try:
         if ',' in base64_string:
             base64_string = base64_string.split(',')[1]
 
         image_bytes = base64.b64decode(base64_string)
-        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
-        image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-
-        return image
+        return decode_image_bytes(image_bytes, min_size)
     except:
         return None
 
@@ -29,7 +87,32 @@ def encode_image_to_base64(image, format='.png'):
         return None
 
 
+def measure_image_quality(image, thumbnail_width=160):
+    """Brilho, contraste (desvio padrão) e nitidez (variância do Laplaciano) em uma miniatura em tons de cinza"""
+    height, width = image.shape[:2]
+    if width > thumbnail_width:
+        thumbnail_size = (thumbnail_width, max(1, int(round(height * thumbnail_width / width))))
+        image = cv2.resize(image, thumbnail_size, interpolation=cv2.INTER_AREA)
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    mean, std_dev = cv2.meanStdDev(gray)
+    _, laplacian_std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+
+    return {
+        'brightness': float(mean[0, 0]),
+        'contrast': float(std_dev[0, 0]),
+        'sharpness': float(laplacian_std[0, 0]) ** 2
+    }
+
+def perceptual_hash(image):
+    """dHash de 64 bits: gradientes horizontais de uma miniatura 9x8 em tons de cinza"""
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
 def validate_image(image, min_size=(640, 480)):
+    # Brilho, contraste e nitidez ficam a cargo do QualityGate, aplicado no cadastro e na autenticação
     if image is None:
         return False, "Imagem inválida ou corrompida"
 
@@ -39,16 +122,6 @@ def validate_image(image, min_size=(640, 480)):
     if width < min_width or height < min_height:
         return False, f"Imagem muito pequena ({width}x{height}). Mínimo: {min_width}x{min_height}"
 
-    mean_brightness = np.mean(image)
-    if mean_brightness < 10:
-        return False, "Imagem muito escura"
-    if mean_brightness > 245:
-        return False, "Imagem muito clara"
-
-    std_dev = np.std(image)
-    if std_dev < 10:
-        return False, "Imagem sem detalhes suficientes"
-
     return True, "OK"
 
 def resize_image(image, target_size=(1280, 720)):
@@ -67,6 +140,22 @@ def resize_image(image, target_size=(1280, 720)):
 
     return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
 
+def select_largest_face(faces):
+    if len(faces) == 0:
+        return None
+    return max(faces, key=lambda f: f[2] * f[3])
+
+def crop_face(image, face_bbox, margin_ratio=0.2):
+    x, y, w, h = face_bbox
+
+    margin = int(max(w, h) * margin_ratio)
+    x1 = max(0, x - margin)
+    y1 = max(0, y - margin)
+    x2 = min(image.shape[1], x + w + margin)
+    y2 = min(image.shape[0], y + h + margin)
+
+    return image[y1:y2, x1:x2]
+
 def preprocess_image(image):
     # Equalização CLAHE
     lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
@@ -81,3 +170,12 @@ def preprocess_image(image):
     # Filtro bilateral
     denoised = cv2.bilateralFilter(enhanced, 9, 75, 75)
     return denoised
+
+def downscale_for_detection(image, max_width=640):
+    height, width = image.shape[:2]
+    if width <= max_width:
+        return image, 1.0
+
+    scale = width / max_width
+    small = cv2.resize(image, (max_width, int(round(height / scale))), interpolation=cv2.INTER_AREA)
+    return small, scale
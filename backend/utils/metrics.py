@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+class Metrics:
+    """Contadores e tempos por etapa (janela das últimas amostras) expostos em /api/metrics"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._timings = defaultdict(lambda: deque(maxlen=self.window))
+        self._timing_counts = defaultdict(int)
+        self._counters = defaultdict(int)
+        self._stats_providers = {}
+
+    def record_timing(self, stage, seconds):
+        with self._lock:
+            self._timings[stage].append(seconds)
+            self._timing_counts[stage] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_timing(stage, time.perf_counter() - start)
+
+    def samples(self):
+        with self._lock:
+            return {stage: list(values) for stage, values in self._timings.items()}
+
+    def merge_samples(self, samples):
+        for stage, values in samples.items():
+            for seconds in values:
+                self.record_timing(stage, seconds)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get_counter(self, counter):
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def counters(self, prefix=''):
+        with self._lock:
+            return {
+                name[len(prefix):]: value
+                for name, value in self._counters.items() if name.startswith(prefix)
+            }
+
+    def register_stats(self, name, provider):
+        # provider() é chamado a cada snapshot (ex.: taxa de acerto de um cache)
+        with self._lock:
+            self._stats_providers[name] = provider
+
+    def stats(self, name):
+        with self._lock:
+            provider = self._stats_providers.get(name)
+        return provider() if provider else None
+
+    def _summarize(self, samples, count):
+        ordered = sorted(samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))] * 1000.0
+
+        return {
+            'count': count,
+            'mean_ms': sum(ordered) / len(ordered) * 1000.0,
+            'p50_ms': percentile(50),
+            'p95_ms': percentile(95),
+            'max_ms': ordered[-1] * 1000.0
+        }
+
+    def snapshot(self):
+        with self._lock:
+            timings = {
+                stage: self._summarize(samples, self._timing_counts[stage])
+                for stage, samples in self._timings.items() if samples
+            }
+            counters = dict(self._counters)
+            providers = dict(self._stats_providers)
+
+        stats = {name: provider() for name, provider in providers.items()}
+        return {'timings': timings, 'counters': counters, 'stats': stats}
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._timing_counts.clear()
+            self._counters.clear()
+
+metrics = Metrics()
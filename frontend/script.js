@@ -276,21 +276,34 @@ if (signupForm) {
         setLoading(true);
 
         try {
+            const formData = new FormData();
+            formData.append('name', name);
+            formData.append('security_level', level);
+            formData.append('image', await (await fetch(capturedImageData)).blob(), 'face');
+
             const response = await fetch(`${API_BASE_URL}/auth/enroll`, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    name: name,
-                    security_level: level,
-                    image: capturedImageData
-                })
+                body: formData
             });
 
             const data = await response.json();
 
             if (data.success) {
+                // The QR code is rendered on demand: exchange the one-time token for it
+                if (data.data && data.data.qr_token) {
+                    const qrResponse = await fetch(`${API_BASE_URL}/auth/mfa-qr`, {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        },
+                        body: JSON.stringify({ qr_token: data.data.qr_token })
+                    });
+                    const qrData = await qrResponse.json();
+                    if (qrData.success) {
+                        data.data.qr_code = qrData.data.qr_code;
+                    }
+                }
+
                 // If server returned a QR code for MFA, store it and redirect
                 // to a dedicated page that displays the QR code. This removes
                 // the inline modal logic and avoids accidental immediate closure.
@@ -329,6 +342,11 @@ if (signupForm) {
 const cameraVideoSignin = document.getElementById('camera-stream-signin');
 let authenticationInProgress = false;
 let authenticationInterval = null;
+// Identifica a sessão da câmera para o servidor rastrear a face entre frames
+const authenticationSessionId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+const STREAM_URL = API_BASE_URL.replace(/^http/, 'ws') + '/auth/stream';
+const STREAM_FRAME_INTERVAL = 300;
+let authenticationSocket = null;
 
 async function authenticateFrame() {
     if (authenticationInProgress || !cameraVideoSignin) return;
@@ -342,16 +360,15 @@ async function authenticateFrame() {
         const context = canvas.getContext('2d');
         context.drawImage(cameraVideoSignin, 0, 0);
 
-        const imageData = canvas.toDataURL('image/jpeg', 0.8);
+        const imageBlob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.8));
 
         const response = await fetch(`${API_BASE_URL}/auth/authenticate`, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'image/jpeg',
+                'X-Session-Id': authenticationSessionId
             },
-            body: JSON.stringify({
-                image: imageData
-            })
+            body: imageBlob
         });
 
         const data = await response.json();
@@ -362,14 +379,7 @@ async function authenticateFrame() {
                 authenticationInterval = null;
             }
 
-            localStorage.setItem('user_name', data.data.user);
-            localStorage.setItem('user_level', data.data.permission_level);
-
-            if (data.data.requires_mfa) {
-                showMFAModal(data.data.user, data.data.permission_level);
-            } else {
-                window.location.href = 'dashboard.html?user=' + encodeURIComponent(data.data.user);
-            }
+            handleAuthenticationSuccess(data.data);
         }
 
     } catch (error) {
@@ -379,6 +389,69 @@ async function authenticateFrame() {
     }
 }
 
+function handleAuthenticationSuccess(result) {
+    localStorage.setItem('user_name', result.user);
+    localStorage.setItem('user_level', result.permission_level);
+
+    if (result.requires_mfa) {
+        showMFAModal(result.user, result.permission_level);
+    } else {
+        window.location.href = 'dashboard.html?user=' + encodeURIComponent(result.user);
+    }
+}
+
+// Streaming: frames binários por uma única conexão WebSocket; o servidor descarta frames
+// atrasados e envia os resultados assim que ficam prontos. Sem WebSocket, volta ao polling.
+function sendStreamFrame(socket) {
+    // Não enfileirar frames enquanto o anterior ainda não saiu do buffer
+    if (socket.readyState !== WebSocket.OPEN || socket.bufferedAmount > 0) return;
+
+    const canvas = document.createElement('canvas');
+    canvas.width = cameraVideoSignin.videoWidth;
+    canvas.height = cameraVideoSignin.videoHeight;
+    canvas.getContext('2d').drawImage(cameraVideoSignin, 0, 0);
+
+    canvas.toBlob(blob => {
+        if (blob && socket.readyState === WebSocket.OPEN) {
+            socket.send(blob);
+        }
+    }, 'image/jpeg', 0.8);
+}
+
+function startPollingAuthentication() {
+    if (!authenticationInterval) {
+        authenticationInterval = setInterval(authenticateFrame, 3000);
+    }
+}
+
+function startStreamingAuthentication() {
+    if (!('WebSocket' in window)) {
+        startPollingAuthentication();
+        return;
+    }
+
+    const socket = new WebSocket(STREAM_URL);
+    let streamTimer = null;
+
+    socket.onopen = () => {
+        authenticationSocket = socket;
+        streamTimer = setInterval(() => sendStreamFrame(socket), STREAM_FRAME_INTERVAL);
+    };
+
+    socket.onmessage = event => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'authenticated' || message.type === 'mfa_required') {
+            handleAuthenticationSuccess(message.data);
+        }
+    };
+
+    socket.onclose = () => {
+        clearInterval(streamTimer);
+        authenticationSocket = null;
+        startPollingAuthentication();
+    };
+}
+
 function showMFAModal(username, userLevel) {
     const modal = document.createElement('div');
     modal.className = 'mfa-modal';
@@ -458,8 +531,10 @@ function showMFAModal(username, userLevel) {
 
     cancelBtn.addEventListener('click', () => {
         modal.remove();
-        if (!authenticationInterval) {
-            authenticationInterval = setInterval(authenticateFrame, 3000);
+        if (authenticationSocket) {
+            authenticationSocket.send(JSON.stringify({ type: 'resume' }));
+        } else {
+            startPollingAuthentication();
         }
     });
 }
@@ -475,7 +550,7 @@ if (cameraVideoSignin) {
         cameraVideoSignin.srcObject = stream;
 
         cameraVideoSignin.addEventListener('loadedmetadata', () => {
-            authenticationInterval = setInterval(authenticateFrame, 3000);
+            startStreamingAuthentication();
         });
     })
     .catch(error => {